@@ -0,0 +1,325 @@
+"""
+Time release-tool against a generated fleet of local git repos.
+
+    python benchmarks/fleet.py --repos 20 --shape diamond --tags 200 --runs 3 -o results.json
+
+Every run builds a fresh fleet in a temporary directory (repos, bare remotes to push to and a
+matching .release-tool.yml in a temporary HOME) and ships a release of its root module in a new
+interpreter, with a local stub of the GitHub API. The phase timings of each run and their medians
+are written as json.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import SocketServer
+import BaseHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHAPES = ("chain", "diamond", "fanout")
+SETUP_STYLES = ("literal", "concat", "exec")
+
+FAKE_GPG = """#!/bin/sh
+cat >/dev/null
+echo "[GNUPG:] SIG_CREATED D 1 8 00 0 0" >&2
+printf -- "-----BEGIN PGP SIGNATURE-----\\nbenchmark\\n-----END PGP SIGNATURE-----\\n"
+"""
+
+CHANGELOG_HEAD = """# Changelog
+
+## [Unreleased]
+### Fixed
+  * fixed a thing in %s
+  *
+
+### Added
+  *
+  *
+
+
+"""
+
+CHANGELOG_SECTION = """## [0.%i.0] - 2017-01-01
+### Fixed
+ * fixed issue %i
+ * fixed another issue
+
+### Added
+ * added feature %i
+
+"""
+
+
+def get_dependencies(shape, count):
+    """index of every repo -> indexes of the repos it depends on, repo 0 is the root"""
+    if shape == "chain":
+        return {i: [i - 1] if i else [] for i in range(count)}
+    if shape == "fanout":
+        return {i: [0] if i else [] for i in range(count)}
+    # a root, a wide middle layer depending on it and a last repo depending on the whole layer
+    dependencies = {i: [0] if i else [] for i in range(count - 1)}
+    dependencies[count - 1] = range(1, count - 1) if count > 2 else [0]
+    return dependencies
+
+
+def render_setup(module_name, pins, style):
+    pin_lines = "".join("    '%s==1.0.0',\n" % pin for pin in pins)
+    if style == "literal":
+        requires = "requires = [\n    'six',\n%s]\n" % pin_lines
+    elif style == "concat":
+        requires = "base = ['six']\nrequires = base + [\n%s]\n" % pin_lines
+    else:
+        requires = "def get_requires():\n    return ['six'] + [\n%s]\n\n\n" \
+                   "requires = get_requires()\n" % pin_lines.replace("    '", "        '")
+    return "import os\nfrom setuptools import setup\n\n%s\nsetup(name='%s', " \
+           "install_requires=requires)\n" % (requires, module_name)
+
+
+def git(directory, *args, **kwargs):
+    process = subprocess.Popen(["git"] + list(args), cwd=directory, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               env=kwargs.get("env"))
+    stdout, stderr = process.communicate(kwargs.get("stdin"))
+    if process.returncode:
+        raise Exception("git %s failed in %s: %s" % (args[0], directory, stderr.strip()))
+    return stdout
+
+
+def make_fleet(base_dir, repos, shape, tags, sections, setup_style):
+    home = os.path.join(base_dir, "home")
+    remotes = os.path.join(base_dir, "remotes")
+    os.makedirs(home)
+    os.makedirs(remotes)
+    env = dict(os.environ, HOME=home)
+    gpg = os.path.join(base_dir, "fake-gpg")
+    with open(gpg, "w") as gpg_file:
+        gpg_file.write(FAKE_GPG)
+    os.chmod(gpg, 0o755)
+    for key, value in [("user.name", "benchmark"), ("user.email", "benchmark@example.com"),
+                       ("user.signingkey", "benchmark@example.com"), ("gpg.program", gpg)]:
+        git(home, "config", "--global", key, value, env=env)
+
+    dependencies = get_dependencies(shape, repos)
+    config = []
+    for i in range(repos):
+        repo_name, module_name = "repo%i" % i, "module%i" % i
+        directory = os.path.join(home, repo_name)
+        os.makedirs(os.path.join(directory, module_name))
+        upstreams = ["module%i" % upstream for upstream in dependencies[i]]
+        with open(os.path.join(directory, module_name, "__init__.py"), "w") as f:
+            f.write('__version__ = "1.0.0"\n')
+        with open(os.path.join(directory, "setup.py"), "w") as f:
+            f.write(render_setup(module_name, upstreams, setup_style))
+        with open(os.path.join(directory, "requirements.txt"), "w") as f:
+            f.write("".join("git+https://github.com/benchmark/repo%s.git@v1.0.0#egg=%s\n" %
+                            (upstream[len("module"):], upstream) for upstream in upstreams))
+        with open(os.path.join(directory, "CHANGELOG.md"), "w") as f:
+            f.write(CHANGELOG_HEAD % module_name)
+            f.write("## [1.0.0] - 2017-01-01\n### Added\n * released\n\n")
+            for section in range(sections, 0, -1):
+                f.write(CHANGELOG_SECTION % (section, section, section))
+
+        git(directory, "init", "-q", env=env)
+        git(directory, "symbolic-ref", "HEAD", "refs/heads/master", env=env)
+        git(directory, "add", "-A", env=env)
+        git(directory, "commit", "-q", "-m", "initial commit", env=env)
+        head = git(directory, "rev-parse", "HEAD", env=env).strip()
+        refs = ["refs/tags/v0.0.%i" % tag for tag in range(tags - 1)] + ["refs/tags/v1.0.0"]
+        git(directory, "update-ref", "--stdin", env=env,
+            stdin="".join("create %s %s\n" % (ref, head) for ref in refs))
+        remote = os.path.join(remotes, "%s.git" % repo_name)
+        git(remotes, "init", "-q", "--bare", remote, env=env)
+        git(directory, "remote", "add", "origin", remote, env=env)
+        git(directory, "push", "-q", "origin", "master", "--tags", env=env)
+
+        config.append("%s:\n  module: %s\n  path: $HOME/%s\n  remote: benchmark\n" %
+                      (repo_name, module_name, repo_name))
+        if upstreams:
+            config.append("  depends on: [%s]\n" % ", ".join(upstreams))
+        if setup_style == "exec":
+            config.append("  exec metadata: true\n")
+    with open(os.path.join(home, ".release-tool.yml"), "w") as f:
+        f.write("".join(config))
+    return home
+
+
+class StubGitHubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers the repo lookups and release creation of the GitHub API"""
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Remaining", "5000")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        full_name = self.path[len("/repos/"):]
+        self._reply(200, {"full_name": full_name,
+                          "git_url": "git://github.invalid/%s.git" % full_name})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(201, {"draft": True})
+
+    def log_message(self, *args):
+        pass
+
+
+class StubGitHubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    # the client keeps a pool of connections alive, each needs its own thread
+    daemon_threads = True
+
+    def __init__(self, *args):
+        BaseHTTPServer.HTTPServer.__init__(self, *args)
+        self.connections = []
+
+    def process_request(self, request, client_address):
+        thread = threading.Thread(target=self.process_request_thread,
+                                  args=(request, client_address))
+        thread.daemon = True
+        self.connections.append((request, thread))
+        thread.start()
+
+    def stop(self):
+        """Stop serving and wait for the handler threads, which would die noisily at exit"""
+        self.shutdown()
+        for request, thread in self.connections:
+            try:
+                # ends the keep-alive connection the handler is waiting on
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            thread.join()
+        self.server_close()
+
+
+def start_stub_github():
+    server = StubGitHubServer(("127.0.0.1", 0), StubGitHubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def run_once(result_path, jobs):
+    """Ship a release of module0, runs in the interpreter started for a single run"""
+    sys.path.insert(0, ROOT)
+    server = start_stub_github()
+    os.environ["RELEASE_TOOL_GITHUB_URL"] = "http://127.0.0.1:%i" % server.server_port
+    try:
+        timings = time_release(jobs)
+    finally:
+        server.stop()
+    with open(result_path, "w") as f:
+        json.dump(timings, f)
+
+
+def time_release(jobs):
+    timings = {}
+
+    start = time.time()
+    from release_tool import conf, journal, tracing
+    from release_tool import release_tool as rt
+    timings["import"] = time.time() - start
+
+    start = time.time()
+    # parses the yaml and writes the normalized config cache
+    conf.load_config()
+    timings["config parse"] = time.time() - start
+    start = time.time()
+    conf.load_config()
+    timings["config parse (cached)"] = time.time() - start
+
+    tracing.enable()
+    stack = rt.make_plan("module0", "release", True)
+    plan = rt.ReleasePlan.from_stack(stack)
+    rt.prefetch_github_repos(plan.repos)
+    rt.execute_plan(journal.Journal.start(plan), jobs)
+    for name, (total, count, longest) in tracing.totals().iteritems():
+        timings[name] = total / 1e6
+    return timings
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repos", default=10, type=int, help="number of repos in the fleet")
+    parser.add_argument("--shape", default="chain", choices=SHAPES,
+                        help="dependency graph of the fleet")
+    parser.add_argument("--tags", default=50, type=int, help="number of tags in each repo")
+    parser.add_argument("--changelog-sections", default=100, type=int,
+                        help="number of released sections in each changelog")
+    parser.add_argument("--setup-style", default="literal", choices=SETUP_STYLES,
+                        help="how setup.py builds its requires")
+    parser.add_argument("--runs", default=3, type=int, help="number of runs to time")
+    parser.add_argument("-j", "--jobs", default=4, type=int,
+                        help="number of repos to ship in parallel")
+    parser.add_argument("-o", "--output", help="write the results here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the generated fleets")
+    parser.add_argument("--run-once", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        return run_once(args.run_once, args.jobs)
+    if args.repos < 2:
+        parser.error("the fleet needs at least two repos")
+
+    runs = []
+    for _ in range(args.runs):
+        base_dir = tempfile.mkdtemp(prefix="release-tool-fleet-")
+        try:
+            start = time.time()
+            home = make_fleet(base_dir, args.repos, args.shape, args.tags,
+                              args.changelog_sections, args.setup_style)
+            generated = time.time() - start
+            result_path = os.path.join(base_dir, "result.json")
+            env = dict(os.environ, HOME=home, GH_TOKEN="benchmark", PYTHONIOENCODING="utf-8")
+            with open(os.devnull, "w") as devnull:
+                # the tool's own output isn't interesting here, errors still go to stderr
+                subprocess.check_call([sys.executable, os.path.abspath(__file__), "--run-once",
+                                       result_path, "--jobs", str(args.jobs)], env=env,
+                                      stdout=devnull)
+            with open(result_path, "r") as f:
+                timings = json.load(f)
+            timings["fleet generation"] = generated
+            runs.append(timings)
+        finally:
+            if args.keep:
+                sys.stderr.write("kept %s\n" % base_dir)
+            else:
+                shutil.rmtree(base_dir)
+
+    phases = sorted(set(phase for timings in runs for phase in timings))
+    results = {
+        "parameters": {key: value for key, value in vars(args).iteritems()
+                       if key not in ("output", "keep", "run_once")},
+        "runs": runs,
+        "median": {phase: median([timings[phase] for timings in runs if phase in timings])
+                   for phase in phases},
+    }
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print output
+
+
+if __name__ == "__main__":
+    main()
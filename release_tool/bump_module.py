@@ -1,21 +1,38 @@
-import git
-import github
 import os
-import sys
-import contextlib
+import re
+import errno
+import threading
+import collections
 import datetime
-from termcolor import colored
 
+import cache
+import catfile
 import changelog
-from conf import get_settings
-
-SETTINGS = get_settings()
-MODULES = {v['module']: k for k, v in SETTINGS.iteritems()}
+import metadata
+import tracing
+from conf import CONFIG
+from gh import GitHubClient
+from overlay import FileOverlay
+from tags import TagIndex, load_tags
+from util import colored, lazy_property, parallel_map, run_git
+from version import Version, SpecifierSet, SPECIFIER_RE, is_specifier
+
+REQUIREMENT_RE = re.compile(r'^\s*([\w.-]+)\s*(.*)$')
+PIP_LINK_RE = re.compile(r'@v?([^#\s]+)#egg=([\w.-]+)')
+METADATA_CACHE = cache.MetadataCache()
+GITHUB_CACHE = cache.ResponseCache()
+_gh_token = None
+_github_client = None
+_github_client_lock = threading.Lock()
 
 
 def get_gh_token():
+    """Ask for the token at most once per run"""
+    global _gh_token
+    if _gh_token is not None:
+        return _gh_token
     if 'GH_TOKEN' in os.environ:
-        return os.environ['GH_TOKEN']
+        _gh_token = os.environ['GH_TOKEN']
     else:
         print """
         Please enter your personal access token. If you don't have one
@@ -24,140 +41,179 @@ def get_gh_token():
 
         You can also set the GH_TOKEN environment variable to avoid seeing this message
         in the future"""
-        return raw_input('token: ').strip()
-
-
-class Version(object):
-    candidate_separator = "rc"
-
-    def __init__(self, major, minor, patch, candidate=None):
-        self.major = major
-        self.minor = minor
-        self.patch = patch
-        self.candidate = candidate
-
-    def __repr__(self):
-        v = "%i.%i.%i" % (self.major, self.minor, self.patch)
-        if self.candidate:
-            v += "rc%i" % self.candidate
-        return v
-
-    def __str__(self):
-        return repr(self)
-
-    @classmethod
-    def parse(cls, version_string):
-        major, minor, patch = version_string.split(".")
-        major, minor = int(major), int(minor)
-        try:
-            patch = int(patch)
-            candidate = None
-        except ValueError:
-            patch, candidate = patch.split(cls.candidate_separator)
-            patch, candidate = int(patch), int(candidate)
-        return cls(major, minor, patch, candidate)
+        _gh_token = raw_input('token: ').strip()
+    return _gh_token
 
-    @property
-    def is_candidate(self):
-        return False if not self.candidate else True
 
-    @property
-    def is_release(self):
-        return True if not self.candidate else False
+def get_github_client():
+    """The GitHub client shared by every repo, created on first use"""
+    global _github_client
+    with _github_client_lock:
+        if _github_client is None:
+            # answering from the cache doesn't need a token
+            token = None if GITHUB_CACHE.offline else get_gh_token()
+            _github_client = GitHubClient(token, cache=GITHUB_CACHE)
+        return _github_client
+
+
+def pin_matches(pin, version):
+    """Whether a pinned version (or a specifier such as >=1.2) accepts version"""
+    if pin is None:
+        return False
+    try:
+        if not isinstance(version, Version):
+            version = Version.parse(version)
+        if is_specifier(pin):
+            return SpecifierSet(pin).contains(version)
+        return Version.parse(pin) == version
+    except ValueError:
+        return False
+
+
+def format_requirement(module_name, pin):
+    """A requirement as written in setup.py, from a pin as get_module_requires returns it"""
+    return "%s%s" % (module_name, pin if is_specifier(pin) else "==%s" % pin)
 
-    @property
-    def tag(self):
-        return "v%s" % self
-
-    def release(self):
-        if not self.is_candidate:
-            print "there is no candidate to release"
-            sys.exit(1)
-
-    def bump_candidate(self, major=None, minor=None, patch=None):
-        if not major and not minor and not patch and self.is_release:
-            patch = True
-        is_version_bump = True if (major or minor or patch) else False
-
-        if major:
-            self.major += 1
-            self.minor = 0
-            self.patch = 0
-        elif minor:
-            self.minor += 1
-            self.patch = 0
-        elif patch:
-            self.patch += 1
-        if is_version_bump:
-            self.candidate = 0
-        self.candidate += 1
-
-    def bump_release(self, major=None, minor=None, patch=None):
-
-        if not major and not minor and not patch and self.is_release:
-            patch = True
-        elif self.is_candidate:
-            self.candidate = None
-
-        if major:
-            self.major += 1
-            self.minor = 0
-            self.patch = 0
-        elif minor:
-            self.minor += 1
-            self.patch = 0
-        elif patch:
-            self.patch += 1
-            self.candidate = 0
+
+def repin(spec, version):
+    """spec with its version replaced, ranges and operators that would exclude it become =="""
+    match = SPECIFIER_RE.match(spec)
+    if match and match.group(1) in ("==", "~=", ">=", "<="):
+        return "%s%s" % (match.group(1), version)
+    return "==%s" % version
 
 
 class BumpGitModule(object):
-    def __init__(self, repo_name):
+    def __init__(self, repo_name, ref=None):
         self.repo_name = repo_name
-        self.module_name = SETTINGS[self.repo_name]['module']
-        self.directory = SETTINGS[self.repo_name]['path']
-        self.git_repo = git.Repo(self.directory)
-        active_branch = self.git_repo.active_branch
-        is_dirty = self.git_repo.is_dirty()
-        self.current_version = self._get_current_version()
+        self.module_name = CONFIG.settings[self.repo_name]['module']
+        self.directory = CONFIG.settings[self.repo_name]['path']
+        # read the files at this branch, tag or commit instead of from the working tree
+        self.ref = ref
+        self.new_version = None
+
+    @lazy_property
+    def git_repo(self):
+        import git
+        with tracing.span("open repo", repo=self.repo_name):
+            return git.Repo(self.directory)
+
+    @lazy_property
+    def is_dirty(self):
+        return self.git_repo.is_dirty()
+
+    @lazy_property
+    def ref_commit(self):
+        """The commit self.ref points to, resolved once so every file is read at the same one"""
+        commit = catfile.get_reader(self.directory).resolve(self.ref)
+        if commit is None:
+            raise Exception("%s has no commit %s" % (self.repo_name, self.ref))
+        return commit
+
+    def read_file(self, path):
+        """Contents of a file of the repo, at self.ref if it's set"""
+        if self.ref is None:
+            with open(path, "rb") as f:
+                return f.read()
+        data = catfile.get_reader(self.directory).read_file(
+            self.ref_commit, os.path.relpath(path, self.directory))
+        if data is None:
+            raise IOError(errno.ENOENT, "%s doesn't exist at %s" % (path, self.ref))
+        return data
+
+    def exists(self, path):
+        if self.ref is None:
+            return os.path.isfile(path)
+        return catfile.get_reader(self.directory).exists(self.ref_commit,
+                                                         os.path.relpath(path, self.directory))
+
+    @lazy_property
+    def current_version(self):
+        return Version.parse(self._cached("current_version",
+                                          lambda: repr(self._get_current_version())))
+
+    @lazy_property
+    def commits_since_tag(self):
+        """(nearest v* tag, number of commits on top of it) from a single git describe"""
+        def describe():
+            # describe exits with 128 when there is no matching tag
+            output = run_git(self.directory, ["describe", "--tags", "--match", "v*", "--long",
+                                              self.ref_commit if self.ref else "HEAD"],
+                             ok_returncodes=(0, 128)).strip()
+            if not output:
+                return [None, None]
+            tag, count, _ = output.rsplit("-", 2)
+            return [tag, int(count)]
+        return tuple(self._cached("commits_since_tag", describe))
+
+    @lazy_property
+    def tags(self):
+        return TagIndex(self.directory,
+                        self._cached("tags", lambda: sorted(load_tags(self.directory))))
 
+    @property
+    def github_name(self):
+        return "%s/%s" % (CONFIG.settings[self.repo_name]['remote'], self.repo_name)
+
+    @lazy_property
+    def git_repo_v3(self):
+        return get_github_client().get_repo(self.github_name)
+
+    @lazy_property
+    def _changelog(self):
+        changelog_path = os.path.join(self.directory, 'CHANGELOG.md')
+
+        read = self.read_file if self.ref is not None else None
+
+        def parse():
+            parsed = changelog.Changelog(self.module_name, changelog_path, read=read)
+            return [parsed.start, parsed.unreleased, parsed.tail_offset]
+
+        start, unreleased, tail_offset = self._cached("changelog_head", parse)
+        return changelog.Changelog(self.module_name, changelog_path, start, unreleased,
+                                   tail_offset, read)
+
+    @property
+    def metadata_paths(self):
+        return [os.path.join(self.directory, self.module_name, "__init__.py"),
+                os.path.join(self.directory, "setup.py"),
+                os.path.join(self.directory, "requirements.txt"),
+                os.path.join(self.directory, "CHANGELOG.md")]
+
+    def _cached(self, name, compute):
+        if self.ref is None:
+            fingerprint = cache.get_fingerprint(self.directory, self.metadata_paths)
+        else:
+            # the files at a commit never change, only the tags can
+            fingerprint = cache.get_fingerprint(self.directory, [], self.ref_commit)
+        facts = METADATA_CACHE.get(self.directory, fingerprint)
+        if name not in facts:
+            facts[name] = compute()
+            METADATA_CACHE.update(self.directory, fingerprint, {name: facts[name]})
+        return facts[name]
+
+    def print_status(self):
         msg = u"%s" % self.module_name
+        if self.ref is not None:
+            print msg + colored(u" (%s %s)" % (self.ref, self.ref_commit[:8]), 'blue')
+            return
+        active_branch = self.git_repo.active_branch
         if active_branch != "master":
             msg += colored(u" (%s)" % active_branch, 'blue')
         else:
             msg += colored(u" (%s)" % active_branch, 'green')
-        if is_dirty:
+        if self.is_dirty:
             msg += colored(u" dirty ", 'red') + u"\U0001F4A9"
 
         print msg
 
-        gh_token = get_gh_token()
-        auth = github.Github(gh_token)
-        self.git_repo_v3 = auth.get_repo("%s/%s" % (SETTINGS[self.repo_name]['remote'],
-                                                    self.repo_name))
-        self.new_version = None
-        changelog_path = os.path.join(self.directory, 'CHANGELOG.md')
-        self._changelog = changelog.Changelog(self.module_name, changelog_path)
-
-    @staticmethod
-    def read_file(path, skip_setup=True):
-        with open(path, "r") as f:
-            data = f.read()
-        lines = data.splitlines()
-        results = []
-        for line in lines:
-            if skip_setup and line.startswith("setup("):
-                break
-            results.append(line)
-        return "\n".join(results)
-
-    @staticmethod
-    def _exec_file(path, module_directory):
-        _globals, _locals = {}, {"__file__": path}
-        code = "import sys; sys.path.append('%s');\n%s" % (module_directory,
-                                                           BumpGitModule.read_file(path))
-        eval(compile(code, path, "exec"), _globals, _locals)
-        return _locals
+    def _read_metadata(self, path, *required):
+        execute = CONFIG.settings[self.repo_name]['exec metadata']
+        with tracing.span("read metadata", repo=self.repo_name, file=path):
+            if self.ref is None:
+                return metadata.read_metadata(path, required, self.directory, execute)
+            return metadata.read_source_metadata(self.read_file(path), path, required,
+                                                 self.directory, execute)
 
     @property
     def release_msg(self):
@@ -169,18 +225,16 @@ class BumpGitModule(object):
 
     def _get_current_version(self):
         path = os.path.join(self.directory, self.module_name, "__init__.py")
-        _locals = self._exec_file(path, self.directory)
-        module_version = _locals.get("__version__")
+        module_version = self._read_metadata(path, "__version__").get("__version__")
         if not module_version:
             raise Exception("Repository %s (%s) does not have a __version__ configured "
                             "in __init__.py" % (self.repo_name, self.module_name))
         return Version.parse(module_version)
 
-    def update_init(self):
+    def update_init(self, overlay):
         assert self.new_version
         path = os.path.join(self.directory, self.module_name, "__init__.py")
-        init_file_content = self.read_file(path, False)
-        lines = init_file_content.splitlines()
+        lines = overlay.read_lines(path)
         position = None
         for i, line in enumerate(lines):
             if line.startswith("__version__ = "):
@@ -189,42 +243,55 @@ class BumpGitModule(object):
         if position is None:
             raise Exception("Failed to find __version__ in %s" % path)
         lines[position] = "__version__ = \"%s\"" % self.new_version
-        updated_init_contents = "\n".join(lines) + "\n"
-        with open(path, "w") as init_file:
-            init_file.write(updated_init_contents)
+        overlay.write_lines(path, lines)
 
     def get_module_requires(self):
         path = os.path.join(self.directory, "setup.py")
-        _locals = self._exec_file(path, self.directory)
-        requires = {req.split("==")[0]: req.split("==")[1] for req in _locals.get("requires")
-                    if req.split("==")[0] in MODULES}
+        setup_requires = self._cached(
+            "requires", lambda: list(self._read_metadata(path, "requires").get("requires", [])))
+        requires = {}
+        for req in setup_requires:
+            match = REQUIREMENT_RE.match(req)
+            if match and match.group(1) in CONFIG.modules:
+                # plain pins are kept as the bare version, anything else as the specifier
+                spec = match.group(2).strip()
+                requires[match.group(1)] = spec[2:] if spec.startswith("==") else spec
         return requires
 
-    def update_setup(self, module_name, new_version):
+    def get_requirements_pins(self):
+        path = os.path.join(self.directory, "requirements.txt")
+
+        def read_lines():
+            if not self.exists(path):
+                return []
+            return self.read_file(path).splitlines()
+
+        pins = {}
+        for line in self._cached("requirements", read_lines):
+            match = PIP_LINK_RE.search(line)
+            if match and match.group(2) in CONFIG.modules:
+                pins[match.group(2)] = match.group(1)
+        return pins
+
+    def update_setup(self, overlay, module_name, new_version):
         assert new_version
         path = os.path.join(self.directory, "setup.py")
-        setup_file_contents = self.read_file(path, False)
-        lines = setup_file_contents.splitlines()
-        position = None
+        lines = overlay.read_lines(path)
+        requirement_re = re.compile(r"""(['"])%s\s*([=!~<>][^'"]*)\1""" % re.escape(module_name))
         for i, line in enumerate(lines):
-            if "%s==" % module_name in line:
-                position = i
-                break
-        if position is None:
-            raise Exception("Failed to find requirement for %s in %s" % (module_name, path))
-        wspace = len(lines[position]) - len(lines[position].lstrip())
-        lines[position] = "'%s==%s'," % (module_name, new_version)
-        if wspace:
-            lines[position] = "%s%s" % (" " * wspace, lines[position])
-        updated_setup_contents = "\n".join(lines) + "\n"
-        with open(path, "w") as setup_file:
-            setup_file.write(updated_setup_contents)
-
-    def update_requires(self, module_name, new_version):
+            match = requirement_re.search(line)
+            if match:
+                # only the specifier changes, the quoting and the rest of the line stay
+                lines[i] = line[:match.start(2)] + repin(match.group(2), new_version) + \
+                    line[match.end(2):]
+                overlay.write_lines(path, lines)
+                return
+        raise Exception("Failed to find requirement for %s in %s" % (module_name, path))
+
+    def update_requires(self, overlay, module_name, new_version):
         assert new_version
         path = os.path.join(self.directory, "requirements.txt")
-        requirements_file_contents = self.read_file(path, False)
-        lines = requirements_file_contents.splitlines()
+        lines = overlay.read_lines(path)
         position = None
         for i, line in enumerate(lines):
             if "egg=%s" % module_name in line:
@@ -233,28 +300,38 @@ class BumpGitModule(object):
         if position is None:
             raise Exception("Failed to find requirement for %s in %s" % (module_name, path))
         lines[position] = self.get_pip_link(module_name, new_version)
-        updated_requirements_contents = "\n".join(lines) + "\n"
-        with open(path, "w") as requirements_file:
-            requirements_file.write(updated_requirements_contents)
+        overlay.write_lines(path, lines)
 
     def get_pip_link(self, module_name, version):
-        repo_name = MODULES[module_name]
-        remote = SETTINGS[repo_name]['remote']
+        repo_name = CONFIG.modules[module_name]
+        remote = CONFIG.settings[repo_name]['remote']
         return "git+https://github.com/%s/%s.git@v%s#egg=%s" % (remote, repo_name,
                                                                 version, module_name)
 
     def get_release_message(self):
         return self._changelog.get_release_message(self.new_version)
 
-    def bump_changelog(self):
-        self._changelog.bump(self.new_version)
-        with pushd(self.directory):
-            self.git_repo.git.add(os.path.basename(self._changelog.path))
+    def bump_changelog(self, overlay):
+        head = self._changelog.render_head(self.new_version)
+        if self.ref is not None:
+            # the tail to keep isn't the file on disk, it's part of the new content
+            tail = self.read_file(self._changelog.path)[self._changelog.tail_offset:]
+            overlay.write(self._changelog.path, head + tail)
+        else:
+            overlay.write_head(self._changelog.path, head, self._changelog.tail_offset)
+
+    def push_release(self, branch_name, tag_name, atomic=True):
+        refs = ["refs/heads/%s" % branch_name, "refs/tags/%s" % tag_name]
+        if atomic:
+            # one negotiation with the remote, and either both refs update or neither does
+            self.git_repo.git.push("--atomic", "origin", *refs)
+        else:
+            for ref in refs:
+                self.git_repo.git.push("origin", ref)
 
     def assert_new_tag_is_absent(self):
         new_tag = "v%s" % self.new_version
-        tags = self.git_repo.git.tag()
-        if new_tag in tags.split('\n'):
+        if new_tag in self.tags:
             raise Exception('Tag {} is already present in repo {}.'.format(new_tag,
                                                                            self.module_name))
 
@@ -267,12 +344,13 @@ class UpdateOp(object):
         self.args = tuple(args)
         self._called = False
 
-    def __call__(self):
+    def __call__(self, overlay):
         if self._called:
             raise Exception("Already called!")
         self._called = True
         args = self.args
-        self.fn(*args)
+        with tracing.span("op %s" % self.fn.__name__, repo=self.repo, file=self.path):
+            self.fn(overlay, *args)
 
     def get_info(self):
         return {
@@ -285,137 +363,172 @@ class UpdateOp(object):
 
 class Stack(object):
     def __init__(self):
-        self._stack = []
+        self._pending = collections.deque()
+        self._ops = []
+        self._by_repo = collections.OrderedDict()
         self._position = 0
         self.verbose = False
+        reads_refs = GITHUB_REPOS.ref is not None or GITHUB_REPOS.at_branch
+        self.overlay = FileOverlay(read_repo_file if reads_refs else None)
 
     def add(self, item):
         if not isinstance(item, UpdateOp):
             raise Exception("Invalid op")
-        self._stack.append(item)
+        self._pending.append(item)
+        self._ops.append(item)
+        self._by_repo.setdefault(item.repo, []).append(item)
 
     def __iter__(self):
-        while self._stack:
-            item, self._stack = self._stack[0], self._stack[1:]
+        """The operations in the order they were added, iterating doesn't apply them"""
+        return iter(self._ops)
+
+    def render(self):
+        """Apply the pending operations to the overlay, nothing is written to disk"""
+        while self._pending:
+            item = self._pending.popleft()
             if self.verbose:
                 print "update operation %i:\n%s\n" % (self._position + 1, item.get_info())
-            yield item()
+            item(self.overlay)
             self._position += 1
+        return self.overlay
 
     def __len__(self):
-        return len(self._stack)
+        return len(self._ops)
 
-    @property
-    def files_touched(self):
-        files = set(item.path for item in self._stack if item.path)
-        return list(files)
+    def batch(self, repo):
+        return tuple(self._by_repo.get(repo, ()))
+
+    def batch_files(self, repo):
+        return sorted(set(item.path for item in self.batch(repo) if item.path))
 
     @property
     def repos_touched(self):
-        repos = set(item.repo for item in self._stack if item.repo)
-        return list(repos)
+        return self.repo_sequence
 
     @property
     def repo_sequence(self):
-        result = []
-        for item in self._stack:
-            if item.repo and item.repo not in result:
-                result.append(item.repo)
-        return result
+        return [repo for repo in self._by_repo if repo]
 
     @property
     def total_operations(self):
-        return len(self._stack)
-
-
-def bump_recurse(module_name, is_release, stack, bumped):
-    _repo = GITHUB_REPOS[MODULES[module_name]]
-    depends_on = [repo_settings['module'] for repo_name, repo_settings in SETTINGS.iteritems()
-                  if module_name in repo_settings.get('depends on', [])]
-    for to_bump in depends_on:
-        req = GITHUB_REPOS[MODULES[to_bump]].get_module_requires().get(module_name)
-        if req != _repo.current_version:
-            if is_release:
-                GITHUB_REPOS[MODULES[to_bump]].new_version = Version.parse(
-                    repr(GITHUB_REPOS[MODULES[to_bump]].current_version))
-                GITHUB_REPOS[MODULES[to_bump]].new_version.bump_release()
-            else:
-                GITHUB_REPOS[MODULES[to_bump]].new_version = Version.parse(
-                    repr(GITHUB_REPOS[MODULES[to_bump]].current_version))
-                GITHUB_REPOS[MODULES[to_bump]].new_version.bump_candidate()
-
-                GITHUB_REPOS[MODULES[to_bump]].assert_new_tag_is_absent()
-
-            print "bump %s from %s-->%s" % (GITHUB_REPOS[MODULES[to_bump]].module_name,
-                                            colored(GITHUB_REPOS[MODULES[to_bump]].current_version,
-                                                    attrs=['bold']),
-                                            colored(GITHUB_REPOS[MODULES[to_bump]].new_version,
-                                                    attrs=['bold']))
-
-            stack.add(UpdateOp(os.path.join(GITHUB_REPOS[MODULES[to_bump]].directory,
-                                            GITHUB_REPOS[MODULES[to_bump]].module_name,
-                                            "__init__.py"), to_bump,
-                                GITHUB_REPOS[MODULES[to_bump]].update_init))
-            stack.add(UpdateOp(os.path.join(GITHUB_REPOS[MODULES[to_bump]].directory,
-                                            "setup.py"), to_bump,
-                                GITHUB_REPOS[MODULES[to_bump]].update_setup, _repo.module_name,
-                                _repo.new_version))
-            stack.add(UpdateOp(os.path.join(GITHUB_REPOS[MODULES[to_bump]].directory,
-                                            "requirements.txt"), to_bump,
-                                GITHUB_REPOS[MODULES[to_bump]].update_requires, _repo.module_name,
-                                _repo.new_version))
-
-
-            pos = None
-            for i, l in enumerate(GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased):
-                if l.startswith("  * Bumped `%s`" % bumped):
-                    print "Updating changelog version bump (%i)" % i
-                    pos = i
-                    break
-
-            if GITHUB_REPOS[MODULES[bumped]].new_version.is_release:
-                skip_to = repr(GITHUB_REPOS[MODULES[bumped]].new_version)
-                skip_to = skip_to.replace(".", "")
-                skip_to = "%s---%s" % (skip_to, datetime.datetime.today().strftime('%Y-%m-%d'))
-            else:
-                skip_to = "unreleased"
-
-            changelog_link = "https://github.com/lbryio/%s/blob/master/CHANGELOG.md#%s" % (bumped,
-                                                                                           skip_to)
-            msg = " * Bumped `%s` requirement to %s [see changelog](%s)"
-            msg %= (bumped, GITHUB_REPOS[MODULES[bumped]].new_version, changelog_link)
-            if pos is not None:
-                GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased[pos] = msg
-            else:
-                if "### Changed" not in GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased:
-                    GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased.append("### Changed")
-                    GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased.append(msg)
-                else:
-                    for i, l in enumerate(GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased):
-                        if l == "### Changed":
-                            pos = i + 1
-                            break
-
-                    unreleased = GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased[:pos]
-                    unreleased += [msg]
-                    unreleased += GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased[pos:]
-                    GITHUB_REPOS[MODULES[to_bump]]._changelog.unreleased = unreleased
-
-            if GITHUB_REPOS[MODULES[to_bump]].new_version.is_release:
-                # only update the changelog file for a release
-                stack.add(UpdateOp(os.path.join(GITHUB_REPOS[MODULES[to_bump]].directory,
-                                                'CHANGELOG.md'), to_bump,
-                                    GITHUB_REPOS[MODULES[to_bump]].bump_changelog))
-
-            if SETTINGS[MODULES[to_bump]].get('depends on'):
-                stack = bump_recurse(to_bump, is_release, stack, to_bump)
+        return len(self._ops)
+
+
+def add_bump_changelog_entry(repo, upstream_repo):
+    pos = None
+    for i, l in enumerate(repo._changelog.unreleased):
+        if l.lstrip().startswith("* Bumped `%s`" % upstream_repo.module_name):
+            print "Updating changelog version bump (%i)" % i
+            pos = i
+            break
+
+    if upstream_repo.new_version.is_release:
+        skip_to = repr(upstream_repo.new_version)
+        skip_to = skip_to.replace(".", "")
+        skip_to = "%s---%s" % (skip_to, datetime.datetime.today().strftime('%Y-%m-%d'))
+    else:
+        skip_to = "unreleased"
+
+    changelog_link = "https://github.com/lbryio/%s/blob/master/CHANGELOG.md#%s" % (
+        upstream_repo.module_name, skip_to)
+    msg = " * Bumped `%s` requirement to %s [see changelog](%s)"
+    msg %= (upstream_repo.module_name, upstream_repo.new_version, changelog_link)
+    if pos is not None:
+        if repo._changelog.unreleased[pos].endswith("\n"):
+            msg += "\n"
+        repo._changelog.unreleased[pos] = msg
+    elif "### Changed" not in repo._changelog.unreleased:
+        repo._changelog.unreleased.append("### Changed")
+        repo._changelog.unreleased.append(msg)
+    else:
+        pos = repo._changelog.unreleased.index("### Changed") + 1
+        repo._changelog.unreleased.insert(pos, msg)
+
+
+def assert_new_tags_are_absent(module_names):
+    present = []
+    for module_name in module_names:
+        repo = GITHUB_REPOS[CONFIG.modules[module_name]]
+        if repo.new_version.tag in repo.tags:
+            present.append("%s in %s" % (repo.new_version.tag, module_name))
+    if present:
+        raise Exception("Tags are already present: %s" % ", ".join(present))
+
+
+@tracing.traced("plan dependents", lambda module_name, *args: {"module": module_name})
+def bump_dependents(module_name, is_release, stack, incremental=False):
+    bumped = {module_name}
+    for to_bump in CONFIG.dependency_graph.bump_order(module_name)[1:]:
+        repo = GITHUB_REPOS[CONFIG.modules[to_bump]]
+        requires = repo.get_module_requires()
+        upstreams = [GITHUB_REPOS[CONFIG.modules[upstream]]
+                     for upstream in CONFIG.dependency_graph.upstreams[to_bump]
+                     if upstream in bumped]
+        # a dependent already pinned to the new upstream versions doesn't need a bump
+        upstreams = [upstream_repo for upstream_repo in upstreams
+                     if not pin_matches(requires.get(upstream_repo.module_name),
+                                        upstream_repo.new_version)]
+        if not upstreams:
+            continue
+        if incremental:
+            tag, count = repo.commits_since_tag
+            if count == 0:
+                # nothing but the pins would change, leave it (and what only it pulls in) alone
+                print "skip %s, no changes since %s" % (repo.module_name, tag)
+                continue
+        bumped.add(to_bump)
+
+        if is_release:
+            repo.new_version = repo.current_version.bump_release()
+        else:
+            repo.new_version = repo.current_version.bump_candidate()
+
+        print "bump %s from %s-->%s" % (repo.module_name,
+                                        colored(repo.current_version, attrs=['bold']),
+                                        colored(repo.new_version, attrs=['bold']))
+
+        stack.add(UpdateOp(os.path.join(repo.directory, repo.module_name, "__init__.py"), to_bump,
+                           repo.update_init))
+        for upstream_repo in upstreams:
+            stack.add(UpdateOp(os.path.join(repo.directory, "setup.py"), to_bump,
+                               repo.update_setup, upstream_repo.module_name,
+                               upstream_repo.new_version))
+            stack.add(UpdateOp(os.path.join(repo.directory, "requirements.txt"), to_bump,
+                               repo.update_requires, upstream_repo.module_name,
+                               upstream_repo.new_version))
+            add_bump_changelog_entry(repo, upstream_repo)
+
+        if repo.new_version.is_release:
+            # only update the changelog file for a release
+            stack.add(UpdateOp(os.path.join(repo.directory, 'CHANGELOG.md'), to_bump,
+                               repo.bump_changelog))
     return stack
 
 
-def get_update_ops(name, part, bump_deps=False):
+@tracing.traced("prefetch github repos")
+def prefetch_github_repos(module_names, jobs=16):
+    """Look up the GitHub repos of the given modules concurrently"""
+    repos = [GITHUB_REPOS[CONFIG.modules[module_name]] for module_name in module_names]
+    repos = [repo for repo in repos if "git_repo_v3" not in repo.__dict__]
+    found = get_github_client().get_repos([repo.github_name for repo in repos], jobs)
+    for repo in repos:
+        repo.git_repo_v3 = found[repo.github_name]
+
+
+@tracing.traced("prefetch describe")
+def prefetch_commits_since_tag(module_names, jobs=4):
+    repos = [GITHUB_REPOS[CONFIG.modules[module_name]] for module_name in module_names]
+    parallel_map(lambda repo: repo.commits_since_tag, repos, jobs)
+
+
+@tracing.traced("plan", lambda name, part, *args: {"module": name, "part": part})
+def get_update_ops(name, part, bump_deps=False, incremental=False):
     stack = Stack()
-    repo = GITHUB_REPOS[MODULES[name]]
-    repo.new_version = Version.parse(repr(repo.current_version))
+    for module_name in (CONFIG.dependency_graph.bump_order(name) if bump_deps else [name]):
+        GITHUB_REPOS[CONFIG.modules[module_name]].print_status()
+    if bump_deps and incremental:
+        prefetch_commits_since_tag(CONFIG.dependency_graph.bump_order(name)[1:])
+    repo = GITHUB_REPOS[CONFIG.modules[name]]
 
     bump = {}
     if part == "release":
@@ -431,11 +544,10 @@ def get_update_ops(name, part, bump_deps=False):
         raise Exception("Invalid part to bump")
 
     if is_release:
-        repo.new_version.bump_release(**bump)
+        repo.new_version = repo.current_version.bump_release(**bump)
     else:
-        repo.new_version.bump_candidate(**bump)
+        repo.new_version = repo.current_version.bump_candidate(**bump)
 
-    repo.assert_new_tag_is_absent()
     print "bump %s from %s-->%s" % (repo.module_name, colored(repo.current_version, attrs=['bold']),
                                     colored(repo.new_version, attrs=['bold']))
 
@@ -446,20 +558,61 @@ def get_update_ops(name, part, bump_deps=False):
                        repo.update_init))
 
     if bump_deps:
-        stack = bump_recurse(repo.module_name, is_release, stack, repo.module_name)
+        stack = bump_dependents(repo.module_name, is_release, stack, incremental)
 
+    # check every planned tag before any file gets modified
+    assert_new_tags_are_absent(stack.repo_sequence)
     return stack
 
 
-@contextlib.contextmanager
-def pushd(new_dir):
-    previous_dir = os.getcwd()
-    os.chdir(new_dir)
-    yield
-    os.chdir(previous_dir)
+def read_repo_file(path):
+    """Original contents of a file of one of the repos, read at the ref the repo is read at"""
+    for repo_name in GITHUB_REPOS.loaded:
+        repo = GITHUB_REPOS[repo_name]
+        if path.startswith(os.path.join(repo.directory, "")):
+            return repo.read_file(path)
+    with open(path, "rb") as f:
+        return f.read()
+
 
+class RepoRegistry(object):
+    """Mapping of repo name to BumpGitModule, constructed on first access"""
+
+    def __init__(self):
+        self._repos = {}
+        self._lock = threading.Lock()
+        # ref every repo is read at, set before any of them is constructed
+        self.ref = None
+        # read every repo at its configured branch, for releases that don't use the checkout
+        self.at_branch = False
+
+    def __getitem__(self, repo_name):
+        with self._lock:
+            if repo_name not in self._repos:
+                if repo_name not in CONFIG.settings:
+                    raise KeyError(repo_name)
+                ref = self.ref
+                if self.at_branch:
+                    ref = "refs/heads/%s" % CONFIG.settings[repo_name]['branch']
+                self._repos[repo_name] = BumpGitModule(repo_name, ref)
+            return self._repos[repo_name]
+
+    def __contains__(self, repo_name):
+        return repo_name in CONFIG.settings
+
+    def __iter__(self):
+        return iter(CONFIG.settings)
+
+    def __len__(self):
+        return len(CONFIG.settings)
+
+    def iteritems(self):
+        for repo_name in CONFIG.settings:
+            yield repo_name, self[repo_name]
+
+    @property
+    def loaded(self):
+        return list(self._repos)
 
-GITHUB_REPOS = {}
 
-for repo_name, repo_settings in SETTINGS.iteritems():
-    GITHUB_REPOS[repo_name] = BumpGitModule(repo_name)
+GITHUB_REPOS = RepoRegistry()
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from overlay import atomic_write
+from util import to_str
+
+CACHE_DIR = os.path.expanduser("~/.cache/release-tool")
+MAX_CACHE_BYTES = 16 * 1024 * 1024
+GITHUB_CACHE_DIR = os.path.join(CACHE_DIR, "github")
+GITHUB_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+def get_git_dir(directory):
+    git_dir = os.path.join(directory, ".git")
+    if os.path.isfile(git_dir):
+        # worktrees and submodules have a .git file pointing at the real git directory
+        with open(git_dir, "r") as f:
+            git_dir = os.path.join(directory, f.read().strip().split("gitdir: ", 1)[1])
+    return git_dir
+
+
+def get_common_dir(git_dir):
+    # linked worktrees keep their refs in the main repository's git directory
+    commondir = os.path.join(git_dir, "commondir")
+    if not os.path.isfile(commondir):
+        return git_dir
+    with open(commondir, "r") as f:
+        return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+
+
+def resolve_head(git_dir):
+    with open(os.path.join(git_dir, "HEAD"), "r") as f:
+        head = f.read().strip()
+    if not head.startswith("ref: "):
+        return head
+    ref = head[len("ref: "):]
+    git_dir = get_common_dir(git_dir)
+    ref_path = os.path.join(git_dir, ref)
+    if os.path.isfile(ref_path):
+        with open(ref_path, "r") as f:
+            return f.read().strip()
+    packed_refs = os.path.join(git_dir, "packed-refs")
+    if os.path.isfile(packed_refs):
+        with open(packed_refs, "r") as f:
+            for line in f:
+                if line.rstrip().endswith(" " + ref):
+                    return line.split(" ", 1)[0]
+    return None
+
+
+def get_fingerprint(directory, paths, commit=None):
+    """
+    Fingerprint a repository by its HEAD commit (or the given one) and the stat of its index,
+    tag refs and the given working tree paths
+    """
+    git_dir = get_git_dir(directory)
+    common_dir = get_common_dir(git_dir)
+    fingerprint = hashlib.sha1(commit or resolve_head(git_dir) or "")
+    for path in [os.path.join(git_dir, "index"), os.path.join(common_dir, "packed-refs"),
+                 os.path.join(common_dir, "refs", "tags")] + list(paths):
+        try:
+            stat = os.stat(path)
+            fingerprint.update("%s:%r:%i\n" % (path, stat.st_mtime, stat.st_size))
+        except OSError:
+            fingerprint.update("%s:missing\n" % path)
+    return fingerprint.hexdigest()
+
+
+class MetadataCache(object):
+    """Per repository facts stored on disk, valid for as long as the fingerprint matches"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = True
+        # entries are evicted once per run, before the first one is written
+        self._evicted = False
+        self._lock = threading.Lock()
+
+    def _entry_path(self, repo_directory, fingerprint):
+        key = hashlib.sha1("%s\n%s" % (repo_directory, fingerprint)).hexdigest()
+        return os.path.join(self.directory, "%s.json" % key)
+
+    def get(self, repo_directory, fingerprint):
+        if not self.enabled:
+            return {}
+        path = self._entry_path(repo_directory, fingerprint)
+        try:
+            with open(path, "r") as f:
+                facts = to_str(json.load(f))
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return {}
+        return facts
+
+    def update(self, repo_directory, fingerprint, facts):
+        if not self.enabled:
+            return
+        cached = self.get(repo_directory, fingerprint)
+        cached.update(facts)
+        with self._lock:
+            evict, self._evicted = not self._evicted, True
+        if evict:
+            self.evict()
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        atomic_write(self._entry_path(repo_directory, fingerprint), json.dumps(cached))
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is within max_bytes"""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            # another release-tool may remove entries while they're being listed
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+
+class ResponseCache(object):
+    """
+    GitHub API responses stored on disk with their ETag and Last-Modified validators. Entries
+    not used for ttl seconds are dropped. When offline, requests are only answered from here.
+    """
+
+    def __init__(self, directory=GITHUB_CACHE_DIR, ttl=GITHUB_CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.enabled = True
+        self.offline = False
+
+    def _entry_path(self, url):
+        return os.path.join(self.directory, "%s.json" % hashlib.sha1(url).hexdigest())
+
+    def _is_expired(self, path):
+        return time.time() - os.stat(path).st_mtime > self.ttl
+
+    def get(self, url):
+        if not self.enabled:
+            return None
+        path = self._entry_path(url)
+        try:
+            if self._is_expired(path):
+                os.remove(path)
+                return None
+            with open(path, "r") as f:
+                return to_str(json.load(f))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def update(self, url, etag, last_modified, data):
+        if not self.enabled:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        atomic_write(self._entry_path(url), json.dumps(
+            {"url": url, "etag": etag, "last_modified": last_modified, "data": data}))
+
+    def refresh(self, url):
+        """Mark an entry as just validated, restarting its ttl"""
+        if self.enabled:
+            os.utime(self._entry_path(url), None)
+
+    def evict(self):
+        if not self.enabled or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".json") and self._is_expired(path):
+                os.remove(path)
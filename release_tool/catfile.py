@@ -0,0 +1,105 @@
+import atexit
+import threading
+import subprocess
+
+
+class CatFile(object):
+    """
+    A long running git cat-file --batch (or --batch-check) of a repo. Objects are read through
+    its pipes instead of starting git for every read, one request at a time.
+    """
+
+    def __init__(self, directory, mode="--batch"):
+        self.directory = directory
+        self.mode = mode
+        self._process = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(["git", "cat-file", self.mode], cwd=self.directory,
+                                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        return self._process
+
+    def _request(self, spec):
+        """(sha, type, size, contents) of an object, None if it doesn't exist"""
+        if "\n" in spec:
+            raise ValueError("Invalid object name %r" % spec)
+        with self._lock:
+            process = self._start()
+            process.stdin.write(spec + "\n")
+            process.stdin.flush()
+            header = process.stdout.readline()
+            if not header:
+                self.close()
+                raise Exception("git cat-file exited in %s" % self.directory)
+            if header.endswith(" missing\n") or header.endswith(" ambiguous\n"):
+                return None
+            sha, kind, size = header.split()
+            contents = None
+            if self.mode == "--batch":
+                contents = process.stdout.read(int(size))
+                # every object is followed by a newline
+                process.stdout.read(1)
+            return sha, kind, int(size), contents
+
+    def read(self, spec):
+        """Contents of an object such as v1.0.0:setup.py, None if it doesn't exist"""
+        found = self._request(spec)
+        return found[3] if found else None
+
+    def info(self, spec):
+        """(sha, type, size) of an object, None if it doesn't exist"""
+        found = self._request(spec)
+        return found[:3] if found else None
+
+    def close(self):
+        process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            process.stdin.close()
+            process.wait()
+
+
+class CatFileReader(object):
+    """Reads files and resolves refs of one repo without spawning a process per lookup"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._batch = CatFile(directory, "--batch")
+        self._check = CatFile(directory, "--batch-check")
+
+    def read_file(self, ref, path):
+        """Contents of path (relative to the repo) at ref, None if it isn't there"""
+        return self._batch.read("%s:%s" % (ref, path))
+
+    def exists(self, ref, path):
+        return self._check.info("%s:%s" % (ref, path)) is not None
+
+    def resolve(self, ref):
+        """sha of the commit ref points to, None if there is no such commit"""
+        found = self._check.info("%s^{commit}" % ref)
+        return found[0] if found else None
+
+    def close(self):
+        self._batch.close()
+        self._check.close()
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(directory):
+    """The reader of a repo, started once and shared by every thread"""
+    with _readers_lock:
+        if directory not in _readers:
+            _readers[directory] = CatFileReader(directory)
+        return _readers[directory]
+
+
+@atexit.register
+def close_readers():
+    with _readers_lock:
+        for reader in _readers.itervalues():
+            reader.close()
+        _readers.clear()
@@ -1,8 +1,14 @@
+import io
+import os
 import datetime
 import re
 
+import tracing
+from version import Version, SpecifierSet, is_specifier
+
 CHANGELOG_START_RE = re.compile(r'^\#\# \[Unreleased\]')
 CHANGELOG_END_RE = re.compile(r'^\#\# \[.*\] - \d{4}-\d{2}-\d{2}')
+RELEASE_HEADER_RE = re.compile(r'^\#\# \[(.*)\] - (\d{4}-\d{2}-\d{2})')
 # if we come across a section header between two release section headers
 # then we probably have an improperly formatted changelog
 CHANGELOG_ERROR_RE = re.compile(r'^\#\# ')
@@ -17,42 +23,62 @@ for section in VALID_SECTIONS:
 
 TEMPLATE += "\n"
 
+# path -> (mtime, size, index)
+_INDEX_CACHE = {}
+
+
+def parse_version_range(versions):
+    """Parse 'X.Y.Z' or 'A..B' (A excluded, B included, either side may be left open)"""
+    if ".." not in versions:
+        return versions.lstrip("v"), versions.lstrip("v")
+    low, high = versions.split("..", 1)
+    return low.lstrip("v") or None, high.lstrip("v") or None
+
 
 class Changelog(object):
-    def __init__(self, module_name, path):
+    def __init__(self, module_name, path, start=None, unreleased=None, tail_offset=None,
+                 read=None):
         self.module_name = module_name
         self.path = path
-        self.start = []
-        self.unreleased = []
-        self.rest = []
-        self._parse()
-
+        # read(path) gives the contents when they don't come from the file, e.g. at a git ref
+        self.read = read
+        if start is None or unreleased is None or tail_offset is None:
+            self.start, self.unreleased, self.tail_offset = self._parse()
+        else:
+            self.start, self.unreleased, self.tail_offset = start, unreleased, tail_offset
+
+    @tracing.traced("changelog parse", lambda self: {"module": self.module_name})
     def _parse(self):
-        with open(self.path) as fp:
-            lines = fp.readlines()
-
+        """
+        Read up to the first released section, returns the lines before the unreleased
+        section, the normalized unreleased section and the byte offset of the released history
+        """
+        start, unreleased = [], []
         unreleased_start_found = False
-        unreleased_end_found = False
-
-        for line in lines:
-            if not unreleased_start_found:
-                self.start.append(line)
-                if CHANGELOG_START_RE.search(line):
-                    unreleased_start_found = True
-                continue
-            if unreleased_end_found:
-                self.rest.append(line)
-                continue
-            if CHANGELOG_END_RE.search(line):
-                self.rest.append(line)
-                unreleased_end_found = True
-                continue
-            if CHANGELOG_ERROR_RE.search(line):
-                raise Exception('Failed to parse {}: {}'.format(self.path,
-                                                                'unexpected section header found'))
-            self.unreleased.append(line)
-
-        self.unreleased = self._normalize_section(self.unreleased)
+        offset = 0
+
+        with self._open() as fp:
+            for line in fp:
+                if not unreleased_start_found:
+                    start.append(line)
+                    offset += len(line)
+                    if CHANGELOG_START_RE.search(line):
+                        unreleased_start_found = True
+                    continue
+                if CHANGELOG_END_RE.search(line):
+                    break
+                if CHANGELOG_ERROR_RE.search(line):
+                    raise Exception('Failed to parse {}: {}'.format(
+                        self.path, 'unexpected section header found'))
+                unreleased.append(line)
+                offset += len(line)
+
+        return start, self._normalize_section(unreleased), offset
+
+    def _open(self):
+        if self.read is None:
+            return open(self.path, 'rb')
+        return io.BytesIO(self.read(self.path))
 
     @staticmethod
     def _normalize_section(lines):
@@ -93,6 +119,80 @@ class Changelog(object):
                     output.append(' * {}'.format(entry))
         return output
 
+    @property
+    @tracing.traced("changelog index", lambda self: {"module": self.module_name})
+    def index(self):
+        """
+        (version, date, start, end) of every released section, newest first, where start and
+        end are the byte offsets of the section's body. Built lazily and cached by mtime.
+        """
+        stat = os.stat(self.path) if self.read is None else None
+        cached = _INDEX_CACHE.get(self.path)
+        if stat and cached and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        index = []
+        with self._open() as fp:
+            fp.seek(self.tail_offset)
+            offset = self.tail_offset
+            for line in fp:
+                match = RELEASE_HEADER_RE.match(line)
+                if match:
+                    if index:
+                        index[-1][3] = offset
+                    index.append([match.group(1), match.group(2), offset + len(line), None])
+                offset += len(line)
+        if index:
+            index[-1][3] = offset
+        index = [tuple(entry) for entry in index]
+        if stat:
+            _INDEX_CACHE[self.path] = (stat.st_mtime, stat.st_size, index)
+        return index
+
+    def get_sections(self, versions=None):
+        """
+        Return the index entries matching a version, an A..B range or a specifier such as
+        >=1.2, the latest by default
+        """
+        index = self.index
+        if not versions:
+            return index[:1]
+        if is_specifier(versions):
+            specifiers = SpecifierSet(versions)
+            matches = specifiers.contains
+        else:
+            low, high = parse_version_range(versions)
+            if low == high:
+                return [entry for entry in index if entry[0].lstrip("v") == low]
+            low = Version.parse(low) if low else None
+            high = Version.parse(high) if high else None
+            matches = lambda version: (low is None or version > low) and \
+                (high is None or version <= high)
+        sections = []
+        for entry in index:
+            try:
+                version = Version.parse(entry[0])
+            except ValueError:
+                continue
+            if matches(version):
+                sections.append(entry)
+        return sections
+
+    @tracing.traced("changelog notes", lambda self, *args: {"module": self.module_name})
+    def get_notes(self, versions=None):
+        """Read the release notes of the matching sections, seeking directly to each of them"""
+        notes = []
+        with self._open() as fp:
+            for version, date, start, end in self.get_sections(versions):
+                fp.seek(start)
+                lines = fp.read(end - start).splitlines()
+                try:
+                    body = '\n'.join(self._normalize_section(lines))
+                except Exception:
+                    # older sections may predate the format, show them as they are
+                    body = '\n'.join(line for line in lines if line.strip())
+                notes.append("## [{}] - {}\n{}".format(version, date, body.rstrip('\n')))
+        return notes
+
     def get_release_message(self, version):
         if not self.unreleased:
             raise Exception("No changelog entry for %s!" % self.module_name)
@@ -100,17 +200,12 @@ class Changelog(object):
         return "## [{}] - {}\n{}".format(version, today.strftime('%Y-%m-%d'),
                                          '\n'.join(self.unreleased))
 
-    def bump(self, version):
+    def render_head(self, version):
+        """Render everything before the released history, which stays as it is"""
         if not self.unreleased:
             raise Exception("No changelog entry for %s!" % self.module_name)
 
         today = datetime.datetime.today()
         header = "## [{}] - {}\n".format(version, today.strftime('%Y-%m-%d'))
 
-        changelog_data = (
-            ''.join([''.join(self.start), TEMPLATE, header, '\n'.join(self.unreleased), '\n\n',
-                     ''.join(self.rest)])
-        )
-
-        with open(self.path, 'w') as fp:
-            fp.write(changelog_data)
+        return ''.join([''.join(self.start), TEMPLATE, header, '\n'.join(self.unreleased), '\n\n'])
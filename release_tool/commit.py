@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+from util import run_git
+
+
+def get_signoff(directory):
+    ident = run_git(directory, ["var", "GIT_COMMITTER_IDENT"]).strip()
+    # drop the timestamp and timezone following the email
+    return "Signed-off-by: %s" % ident[:ident.rindex(">") + 1]
+
+
+def write_blobs(directory, paths):
+    stdin = "".join("%s\n" % path for path in paths)
+    return run_git(directory, ["hash-object", "-w", "--stdin-paths"], stdin=stdin).split()
+
+
+def write_blob(directory, content):
+    return run_git(directory, ["hash-object", "-w", "--stdin"], stdin=content).strip()
+
+
+def get_modes(directory, commit, paths):
+    """path -> mode of the given paths at commit, paths that aren't there are left out"""
+    output = run_git(directory, ["ls-tree", "-z", commit, "--"] + list(paths))
+    modes = {}
+    for line in output.split("\0"):
+        if line:
+            info, path = line.split("\t", 1)
+            modes[path] = info.split(" ", 1)[0]
+    return modes
+
+
+def commit_blobs(directory, branch, blobs, message, sign=True, signoff=True):
+    """
+    Create a single commit on top of branch that replaces the given paths with the given blobs.
+    The tree is built in a temporary index from the branch tip, the user's index and working
+    tree aren't read. Returns (parent, commit) shas.
+    """
+    ref = "refs/heads/%s" % branch
+    parent = run_git(directory, ["rev-parse", "--verify", ref]).strip()
+    if signoff:
+        message = "%s\n\n%s\n" % (message.rstrip("\n"), get_signoff(directory))
+
+    tmp_dir = tempfile.mkdtemp(prefix="release-tool-index-")
+    try:
+        env = dict(os.environ)
+        env["GIT_INDEX_FILE"] = os.path.join(tmp_dir, "index")
+        run_git(directory, ["read-tree", parent], env=env)
+        index_info = "".join("%s %s\t%s\n" % (mode, sha, path) for path, (mode, sha)
+                             in sorted(blobs.iteritems()))
+        run_git(directory, ["update-index", "--add", "--index-info"], env=env, stdin=index_info)
+        tree = run_git(directory, ["write-tree"], env=env).strip()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    args = ["commit-tree", tree, "-p", parent, "-F", "-"]
+    if sign:
+        args.append("-S")
+    commit = run_git(directory, args, stdin=message).strip()
+    run_git(directory, ["update-ref", "-m", "release-tool: %s" % message.splitlines()[0], ref,
+                        commit, parent])
+    return parent, commit
+
+
+def commit_files(directory, branch, paths, message, sign=True, signoff=True):
+    """
+    Commit only the given working tree files on top of branch in one signed commit, then sync
+    their entries in the real index so the checkout is clean.
+    """
+    paths = [os.path.relpath(path, directory) for path in paths]
+    shas = write_blobs(directory, paths)
+    blobs = {}
+    for path, sha in zip(paths, shas):
+        executable = os.stat(os.path.join(directory, path)).st_mode & 0o111
+        blobs[path] = ("100755" if executable else "100644", sha)
+    parent, commit = commit_blobs(directory, branch, blobs, message, sign, signoff)
+    run_git(directory, ["update-index", "--add", "--"] + paths)
+    return commit
+
+
+def commit_written_blobs(directory, branch, shas, message, sign=True, signoff=True):
+    """
+    Commit blobs already in the object store (path -> sha, relative to the repo) on top of
+    branch, keeping the modes the paths have there. The checkout isn't read or changed.
+    """
+    modes = get_modes(directory, "refs/heads/%s" % branch, shas)
+    blobs = {path: (modes.get(path, "100644"), sha) for path, sha in shas.iteritems()}
+    parent, commit = commit_blobs(directory, branch, blobs, message, sign, signoff)
+    return commit
@@ -1,9 +1,21 @@
 import os
-import yaml
+import json
+import hashlib
+
+import tracing
+from cache import CACHE_DIR
+from graph import DependencyGraph
+from overlay import atomic_write
+from util import lazy_property, to_str
+
+DEFAULT_CONF_PATH = os.path.expanduser("~/.release-tool.yml")
+CONF_CACHE_DIR = os.path.join(CACHE_DIR, "config")
 
 
 def get_conf_file(conf_path=None):
-    conf_path = conf_path or os.path.expanduser("~/.release-tool.yml")
+    # yaml is slow to import and only needed when the normalized config isn't cached
+    import yaml
+    conf_path = conf_path or DEFAULT_CONF_PATH
     if not os.path.isfile(conf_path):
         raise Exception("Config file (%s) is missing" % conf_path)
     with open(conf_path, "r") as conf_file:
@@ -11,8 +23,8 @@ def get_conf_file(conf_path=None):
     return yaml.safe_load(data)
 
 
-def get_settings():
-    conf_file = get_conf_file()
+def normalize_settings(conf_file):
+    """Fill in the defaults of every repo, paths are left unexpanded"""
     settings = {}
     for repo_name, repo_settings in conf_file.iteritems():
         settings[repo_name] = repo_settings
@@ -20,5 +32,76 @@ def get_settings():
             settings[repo_name]['module'] = repo_name
         if 'branch' not in repo_settings:
             settings[repo_name]['branch'] = 'master'
-        settings[repo_name]['path'] = os.path.expandvars(settings[repo_name]['path'])
+        if 'exec metadata' not in repo_settings:
+            settings[repo_name]['exec metadata'] = False
+    return settings
+
+
+def expand_paths(settings):
+    for repo_settings in settings.itervalues():
+        repo_settings['path'] = os.path.expandvars(repo_settings['path'])
     return settings
+
+
+def load_config(conf_path=None, use_cache=True):
+    """
+    The normalized settings, the module -> repo map and the dependency graph of a config file.
+    They're cached on disk until the file's mtime or size changes.
+    """
+    conf_path = os.path.abspath(conf_path or DEFAULT_CONF_PATH)
+    if not os.path.isfile(conf_path):
+        raise Exception("Config file (%s) is missing" % conf_path)
+    stat = os.stat(conf_path)
+    key = [stat.st_mtime, stat.st_size]
+    cache_path = os.path.join(CONF_CACHE_DIR, "%s.json" % hashlib.sha1(conf_path).hexdigest())
+    data = None
+    if use_cache:
+        try:
+            with open(cache_path, "r") as f:
+                data = to_str(json.load(f))
+        except (IOError, OSError, ValueError):
+            pass
+    if data is None or data["key"] != key:
+        settings = normalize_settings(get_conf_file(conf_path))
+        data = {
+            "key": key,
+            "settings": settings,
+            "modules": {v['module']: k for k, v in settings.iteritems()},
+            "graph": DependencyGraph(settings).to_dict(),
+        }
+        if use_cache:
+            if not os.path.isdir(CONF_CACHE_DIR):
+                os.makedirs(CONF_CACHE_DIR)
+            atomic_write(cache_path, json.dumps(data))
+    # environment variables in the paths are expanded on every run, they aren't cached
+    expand_paths(data["settings"])
+    return data
+
+
+class Config(object):
+    """The config in use, loaded on first access so the command line can choose the file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.use_cache = True
+
+    @lazy_property
+    def _data(self):
+        with tracing.span("config load"):
+            return load_config(self.path, self.use_cache)
+
+    @property
+    def settings(self):
+        return self._data["settings"]
+
+    @property
+    def modules(self):
+        """module name -> repo name"""
+        return self._data["modules"]
+
+    @lazy_property
+    def dependency_graph(self):
+        return DependencyGraph.from_dict(self._data["graph"])
+
+
+CONFIG = Config()
@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+
+import tracing
+from util import parallel_map
+
+DEFAULT_API_URL = "https://api.github.com"
+# point the client at a stub server with RELEASE_TOOL_GITHUB_URL=http://127.0.0.1:8000
+API_URL_ENV = "RELEASE_TOOL_GITHUB_URL"
+POOL_SIZE = 16
+MAX_ATTEMPTS = 5
+# seconds to wait for a connection, and then between bytes of the response
+REQUEST_TIMEOUT = 30
+# don't sleep through a rate limit that resets later than this, fail instead
+MAX_RATE_LIMIT_WAIT = 5 * 60
+
+
+class GitHubRepo(object):
+    """The parts of a GitHub repository the release tool uses"""
+
+    def __init__(self, client, data):
+        self.client = client
+        self.full_name = data["full_name"]
+        self.git_url = data["git_url"]
+
+    def create_git_release(self, tag, name, message, draft=False, prerelease=False):
+        return self.client.request("POST", "/repos/%s/releases" % self.full_name, json={
+            "tag_name": tag,
+            "name": name,
+            "body": message,
+            "draft": draft,
+            "prerelease": prerelease,
+        })
+
+
+class GitHubClient(object):
+    """
+    GitHub API client sharing one keep-alive connection pool between threads. Requests wait
+    out an exhausted rate limit. GETs are retried on server and connection errors with
+    exponential backoff, and revalidated against the response cache if one is given, a 304
+    doesn't use up the rate limit.
+    """
+
+    def __init__(self, token, base_url=None, pool_size=POOL_SIZE, cache=None):
+        # requests takes a while to import, only pay for it when GitHub is used
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.base_url = (base_url or os.environ.get(API_URL_ENV) or DEFAULT_API_URL).rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept": "application/vnd.github.v3+json",
+            "User-Agent": "release-tool",
+        })
+        if token:
+            self.session.headers["Authorization"] = "token %s" % token
+        # failures to connect or to get an answer in time are retried like server errors
+        self._transient_errors = (requests.ConnectionError, requests.Timeout)
+        self.cache = cache
+        if cache is not None:
+            cache.evict()
+        self._lock = threading.Lock()
+        # time at which an exhausted rate limit resets, shared by every thread
+        self._rate_limit_reset = None
+
+    def _wait_for_rate_limit(self):
+        with self._lock:
+            reset = self._rate_limit_reset
+        delay = (reset or 0) - time.time()
+        if delay <= 0:
+            return
+        if delay > MAX_RATE_LIMIT_WAIT:
+            raise Exception("GitHub API rate limit exhausted until %s" %
+                            time.strftime("%H:%M:%S", time.localtime(reset)))
+        with tracing.span("github rate limit wait"):
+            time.sleep(delay)
+
+    def _update_rate_limit(self, response):
+        """Whether the request was rejected by a rate limit and should be retried"""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        retry_after = response.headers.get("Retry-After")
+        rejected = response.status_code in (403, 429) and (remaining == "0" or retry_after)
+        with self._lock:
+            if retry_after and rejected:
+                # secondary rate limits only say how long to back off
+                self._rate_limit_reset = time.time() + int(retry_after)
+            elif remaining == "0" and reset:
+                self._rate_limit_reset = int(reset) + 1
+            elif remaining is not None:
+                self._rate_limit_reset = None
+        return rejected
+
+    def _send(self, method, url, path, **kwargs):
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        # a POST that failed may still have been acted on, repeating it could create a second
+        # release. Requests turned away by a rate limit weren't, those are retried either way.
+        retry = method == "GET"
+        for attempt in range(MAX_ATTEMPTS):
+            last_attempt = attempt == MAX_ATTEMPTS - 1
+            self._wait_for_rate_limit()
+            try:
+                with tracing.span("github %s" % method, path=path):
+                    response = self.session.request(method, url, **kwargs)
+            except self._transient_errors:
+                if last_attempt or not retry:
+                    raise
+            else:
+                if self._update_rate_limit(response):
+                    continue
+                if response.status_code < 500 or last_attempt or not retry:
+                    break
+            time.sleep(2 ** attempt)
+        return response
+
+    def request(self, method, path, **kwargs):
+        """Make a request and return the decoded json response"""
+        url = self.base_url + path
+        cache = self.cache if method == "GET" else None
+        cached = cache.get(url) if cache is not None else None
+        if self.cache is not None and self.cache.offline:
+            if cached is None:
+                raise Exception("Can't %s %s offline, it isn't cached" % (method, path))
+            return cached["data"]
+        if cached is not None:
+            headers = dict(kwargs.pop("headers", None) or {})
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+            kwargs["headers"] = headers
+
+        response = self._send(method, url, path, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            cache.refresh(url)
+            return cached["data"]
+        if response.status_code >= 400:
+            raise Exception("GitHub %s %s failed (%i): %s" % (method, path, response.status_code,
+                                                              response.text.strip()))
+        data = response.json()
+        if cache is not None:
+            cache.update(url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                         data)
+        return data
+
+    def get_repo(self, full_name):
+        return GitHubRepo(self, self.request("GET", "/repos/%s" % full_name))
+
+    def get_repos(self, full_names, jobs=POOL_SIZE):
+        """Look up several repos concurrently, returns full name -> GitHubRepo"""
+        full_names = list(full_names)
+        return dict(zip(full_names, parallel_map(self.get_repo, full_names, jobs)))
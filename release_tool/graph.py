@@ -0,0 +1,80 @@
+class DependencyGraph(object):
+    """Module dependency graph built from the `depends on` entries of the settings"""
+
+    def __init__(self, settings=None):
+        if settings is None:
+            return
+        self.modules = sorted(repo_settings['module'] for repo_settings in settings.itervalues())
+        self.upstreams = {module_name: [] for module_name in self.modules}
+        self.downstreams = {module_name: [] for module_name in self.modules}
+        for repo_settings in settings.itervalues():
+            for dependency in repo_settings.get('depends on', []):
+                # dependencies that aren't configured repos are never bumped by us
+                if dependency not in self.downstreams:
+                    continue
+                self.upstreams[repo_settings['module']].append(dependency)
+                self.downstreams[dependency].append(repo_settings['module'])
+        self.levels = self._get_levels()
+        self.level_of = {module_name: i for i, level in enumerate(self.levels)
+                         for module_name in level}
+
+    def to_dict(self):
+        return {"upstreams": self.upstreams, "downstreams": self.downstreams,
+                "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a graph from to_dict() without recomputing it"""
+        graph = cls()
+        graph.upstreams = data["upstreams"]
+        graph.downstreams = data["downstreams"]
+        graph.modules = sorted(graph.downstreams)
+        graph.levels = data["levels"]
+        graph.level_of = {module_name: i for i, level in enumerate(graph.levels)
+                          for module_name in level}
+        return graph
+
+    def _get_levels(self):
+        in_degree = {module_name: len(self.upstreams[module_name]) for module_name in self.modules}
+        level = [module_name for module_name in self.modules if not in_degree[module_name]]
+        levels = []
+        while level:
+            levels.append(level)
+            next_level = []
+            for module_name in level:
+                for dependent in self.downstreams[module_name]:
+                    in_degree[dependent] -= 1
+                    if not in_degree[dependent]:
+                        next_level.append(dependent)
+            level = sorted(next_level)
+        if sum(len(level) for level in levels) != len(self.modules):
+            cycle = sorted(module_name for module_name, degree in in_degree.iteritems() if degree)
+            raise Exception("Dependency cycle between %s" % ", ".join(cycle))
+        return levels
+
+    def closure(self, module_name):
+        """Return the set of module_name and every module that transitively depends on it"""
+        if module_name not in self.downstreams:
+            raise Exception("Unknown module %s" % module_name)
+        closure = {module_name}
+        to_visit = [module_name]
+        while to_visit:
+            for dependent in self.downstreams[to_visit.pop()]:
+                if dependent not in closure:
+                    closure.add(dependent)
+                    to_visit.append(dependent)
+        return closure
+
+    def bump_levels(self, module_name):
+        """Return the closure of module_name split into topological levels"""
+        closure = self.closure(module_name)
+        levels = []
+        for level in self.levels[self.level_of[module_name]:]:
+            level = [m for m in level if m in closure]
+            if level:
+                levels.append(level)
+        return levels
+
+    def bump_order(self, module_name):
+        """Return the closure of module_name ordered so every module follows its upstreams"""
+        return [m for level in self.bump_levels(module_name) for m in level]
@@ -0,0 +1,72 @@
+import os
+import json
+import threading
+
+from overlay import atomic_write
+from plan import ReleasePlan
+from util import to_str
+
+JOURNAL_PATH = os.path.expanduser("~/.release-tool-journal.json")
+
+# the steps each repo goes through when shipping, in order
+STEPS = ("write", "commit", "tag", "push", "release")
+
+
+class Journal(object):
+    """
+    On disk record of a ship in progress: the plan being shipped and, for every repo, the steps
+    completed so far along with what is needed to undo them. Saved after every step.
+    """
+
+    def __init__(self, path, plan, steps=None):
+        self.path = path
+        self.plan = plan
+        # module -> step -> result of the step
+        self.steps = steps or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, plan, path=None):
+        path = path or JOURNAL_PATH
+        if os.path.exists(path):
+            raise Exception("An unfinished release is recorded in %s, run release-tool resume "
+                            "or release-tool rollback first" % path)
+        journal = cls(path, plan)
+        journal.save()
+        return journal
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or JOURNAL_PATH
+        if not os.path.exists(path):
+            raise Exception("There is no unfinished release to resume (%s is missing)" % path)
+        with open(path, "r") as journal_file:
+            data = to_str(json.load(journal_file))
+        return cls(path, ReleasePlan.from_dict(data["plan"]), data["steps"])
+
+    def save(self):
+        data = {"plan": self.plan.to_dict(), "steps": self.steps}
+        atomic_write(self.path, json.dumps(data, indent=2, sort_keys=True))
+
+    def done(self, module_name, step):
+        return step in self.steps.get(module_name, {})
+
+    def result(self, module_name, step):
+        return self.steps[module_name][step]
+
+    def completed(self, module_name):
+        return [step for step in STEPS if self.done(module_name, step)]
+
+    def record(self, module_name, step, result=None):
+        with self._lock:
+            self.steps.setdefault(module_name, {})[step] = result
+            self.save()
+
+    def forget(self, module_name):
+        with self._lock:
+            self.steps.pop(module_name, None)
+            del self.plan.repos[module_name]
+            self.save()
+
+    def finish(self):
+        os.remove(self.path)
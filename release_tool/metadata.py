@@ -0,0 +1,108 @@
+import os
+import ast
+
+import tracing
+
+# path -> (mtime, size, assignments)
+_METADATA_CACHE = {}
+
+
+class NotStatic(Exception):
+    pass
+
+
+def _evaluate(node, names):
+    if isinstance(node, ast.Str):
+        return node.s
+    if isinstance(node, ast.Num):
+        return node.n
+    if isinstance(node, ast.List):
+        return [_evaluate(item, names) for item in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_evaluate(item, names) for item in node.elts)
+    if isinstance(node, ast.Name):
+        if node.id in names:
+            return names[node.id]
+        raise NotStatic(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _evaluate(node.left, names), _evaluate(node.right, names)
+        if isinstance(left, tuple) != isinstance(right, tuple):
+            raise NotStatic("mismatched concatenation")
+        return left + right
+    raise NotStatic(type(node).__name__)
+
+
+def parse_assignments(source, filename="<unknown>"):
+    """Statically evaluate the literal top level assignments of a python source file"""
+    names = {}
+    for statement in ast.parse(source, filename).body:
+        if isinstance(statement, ast.Assign):
+            targets = [target.id for target in statement.targets if isinstance(target, ast.Name)]
+            try:
+                value = _evaluate(statement.value, names)
+            except NotStatic:
+                for target in targets:
+                    names.pop(target, None)
+                continue
+            for target in targets:
+                names[target] = value
+        elif isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+            target = statement.target.id
+            try:
+                if not isinstance(statement.op, ast.Add) or target not in names:
+                    raise NotStatic(target)
+                names[target] = names[target] + _evaluate(statement.value, names)
+            except (NotStatic, TypeError):
+                names.pop(target, None)
+    return names
+
+
+def source_before_setup(data):
+    results = []
+    for line in data.splitlines():
+        if line.startswith("setup("):
+            break
+        results.append(line)
+    return "\n".join(results)
+
+
+def read_file_before_setup(path):
+    with open(path, "r") as f:
+        return source_before_setup(f.read())
+
+
+@tracing.traced("exec metadata", lambda path, *args: {"path": path})
+def exec_file(path, module_directory, source=None):
+    """Execute a file up to its setup() call, source is used instead of the file if given"""
+    _globals, _locals = {}, {"__file__": path}
+    before_setup = read_file_before_setup(path) if source is None else source_before_setup(source)
+    code = "import sys; sys.path.append('%s');\n%s" % (module_directory, before_setup)
+    eval(compile(code, path, "exec"), _globals, _locals)
+    return _locals
+
+
+def read_metadata(path, required=(), module_directory=None, execute=False):
+    """
+    Read the literal assignments of a file without importing it, results are memoized by
+    path and mtime. If execute is set and a required name could not be found statically the
+    file is executed instead.
+    """
+    stat = os.stat(path)
+    cached = _METADATA_CACHE.get(path)
+    if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+        assignments = cached[2]
+    else:
+        with open(path, "r") as f:
+            assignments = parse_assignments(f.read(), path)
+        _METADATA_CACHE[path] = (stat.st_mtime, stat.st_size, assignments)
+    if execute and any(name not in assignments for name in required):
+        return exec_file(path, module_directory or os.path.dirname(path))
+    return assignments
+
+
+def read_source_metadata(source, path, required=(), module_directory=None, execute=False):
+    """read_metadata of contents that aren't in the working tree, such as a file at a git ref"""
+    assignments = parse_assignments(source, path)
+    if execute and any(name not in assignments for name in required):
+        return exec_file(path, module_directory or os.path.dirname(path), source)
+    return assignments
@@ -0,0 +1,100 @@
+import os
+import shutil
+import difflib
+import tempfile
+from collections import OrderedDict
+
+
+def atomic_write(path, content, tail_offset=None):
+    """
+    Replace path with content by writing a temp file and renaming it over path. If tail_offset
+    is given the existing file from that offset on is copied after content, in chunks.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=".%s." % name, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            if tail_offset is not None:
+                with open(path, "rb") as original:
+                    original.seek(tail_offset)
+                    shutil.copyfileobj(original, f)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.rename(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+
+class FileOverlay(object):
+    """
+    In memory contents of the files being edited. Every file is read at most once no matter how
+    many edits target it, and written once when the overlay is flushed.
+    """
+
+    def __init__(self, read_original=None):
+        # read_original(path) gives the contents to edit when they don't come from the file
+        self.read_original = read_original
+        self._original = {}
+        # path -> (new content, offset in the original file of a tail kept after it)
+        self._contents = OrderedDict()
+
+    def _read_original(self, path, size=-1):
+        if path in self._original:
+            return self._original[path] if size < 0 else self._original[path][:size]
+        if self.read_original is not None:
+            data = self._original[path] = self.read_original(path)
+            return data if size < 0 else data[:size]
+        with open(path, "rb") as f:
+            data = f.read(size)
+        if size < 0:
+            self._original[path] = data
+        return data
+
+    def read(self, path):
+        if path not in self._contents:
+            return self._read_original(path)
+        content, tail_offset = self._contents[path]
+        if tail_offset is None:
+            return content
+        return content + self._read_original(path)[tail_offset:]
+
+    def write(self, path, content):
+        self._contents[path] = (content, None)
+
+    def write_head(self, path, head, tail_offset):
+        """Replace the first tail_offset bytes of path with head, the rest is copied on flush"""
+        self._contents[path] = (head, tail_offset)
+
+    def read_lines(self, path):
+        return self.read(path).splitlines()
+
+    def write_lines(self, path, lines):
+        self.write(path, "\n".join(lines) + "\n")
+
+    def entry(self, path):
+        """The pending (content, tail_offset) of path, tail_offset is None for a full rewrite"""
+        return self._contents[path]
+
+    @property
+    def paths(self):
+        return list(self._contents)
+
+    def diff(self, path):
+        content, tail_offset = self._contents[path]
+        original = ""
+        if self.read_original is not None or os.path.isfile(path):
+            # the untouched tail can't differ, only the head is compared
+            original = self._read_original(path, -1 if tail_offset is None else tail_offset)
+        return "".join(difflib.unified_diff(original.splitlines(True), content.splitlines(True),
+                                            "a/%s" % path.lstrip("/"), "b/%s" % path.lstrip("/")))
+
+    def diffs(self):
+        return [self.diff(path) for path in self._contents]
+
+    def flush(self, paths=None):
+        for path in (self._contents if paths is None else paths):
+            content, tail_offset = self._contents[path]
+            atomic_write(path, content, tail_offset)
+            self._original.pop(path, None)
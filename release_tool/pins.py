@@ -0,0 +1,92 @@
+from overlay import FileOverlay
+from pipeline import DEFAULT_JOBS
+from util import parallel_map
+from version import Version, SpecifierSet, is_specifier
+
+SOURCES = ("setup.py", "requirements.txt")
+
+
+def parse_pin(pin):
+    try:
+        if is_specifier(pin):
+            return SpecifierSet(pin)
+        return Version.parse(pin)
+    except ValueError:
+        return None
+
+
+def accepts(parsed_pin, version):
+    """Whether a pin parsed by parse_pin accepts version, a pin that couldn't be parsed doesn't"""
+    if parsed_pin is None:
+        return False
+    if isinstance(parsed_pin, SpecifierSet):
+        return parsed_pin.contains(version)
+    return parsed_pin == version
+
+
+def _read_pins(repo):
+    return repo.module_name, repo.current_version, {
+        "setup.py": repo.get_module_requires(),
+        "requirements.txt": repo.get_requirements_pins(),
+    }
+
+
+class PinMatrix(object):
+    """The pins every repo has on the other configured modules, read once per repo"""
+
+    def __init__(self, repos, jobs=DEFAULT_JOBS):
+        repos = list(repos)
+        self.repos = {repo.module_name: repo for repo in repos}
+        self.versions = {}
+        # module -> source file -> upstream module -> (pin as written, parsed Version or
+        # SpecifierSet, or None if it couldn't be parsed)
+        self.pins = {}
+        for module_name, version, pins in parallel_map(_read_pins, repos, jobs):
+            self.versions[module_name] = version
+            self.pins[module_name] = {
+                source: {upstream: (pin, parse_pin(pin))
+                         for upstream, pin in pins[source].iteritems()}
+                for source in SOURCES
+            }
+
+    def drift(self):
+        """(module, upstream, source file, pin, upstream's current version) of every stale pin"""
+        stale = []
+        for module_name in sorted(self.pins):
+            for source in SOURCES:
+                for upstream, (pin, parsed) in sorted(self.pins[module_name][source].iteritems()):
+                    if upstream in self.versions and not accepts(parsed, self.versions[upstream]):
+                        stale.append((module_name, upstream, source, pin, self.versions[upstream]))
+        return stale
+
+    def sync(self, overlay=None):
+        """Repin every stale pin to the upstream's current version in one pass over an overlay"""
+        overlay = overlay or FileOverlay()
+        for module_name, upstream, source, _, version in self.drift():
+            repo = self.repos[module_name]
+            if source == "setup.py":
+                repo.update_setup(overlay, upstream, version)
+            else:
+                repo.update_requires(overlay, upstream, version)
+        return overlay
+
+    def format_table(self):
+        modules = sorted(self.pins)
+        upstreams = sorted(set(upstream for module_name in modules for source in SOURCES
+                               for upstream in self.pins[module_name][source]))
+        table = [["module"] + upstreams]
+        for module_name in modules:
+            row = [module_name]
+            for upstream in upstreams:
+                # pin as written -> parsed pin, setup.py and requirements.txt usually agree
+                pins = dict(self.pins[module_name][source][upstream] for source in SOURCES
+                            if upstream in self.pins[module_name][source])
+                cell = "/".join(sorted(pins)) or "-"
+                if any(not accepts(parsed, self.versions[upstream]) for parsed in pins.values()):
+                    cell += " (%s)" % self.versions[upstream]
+                row.append(cell)
+            table.append(row)
+        widths = [max(len(line[i]) for line in table) for i in range(len(table[0]))]
+        return "\n".join(
+            "  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip()
+            for line in table)
@@ -0,0 +1,54 @@
+import sys
+import traceback
+
+from util import parallel_map
+
+DEFAULT_JOBS = 4
+
+
+class StepResult(object):
+    def __init__(self, name, result=None, error=None, trace=None):
+        self.name = name
+        self.result = result
+        self.error = error
+        self.trace = trace
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+class _Step(object):
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, name):
+        try:
+            return StepResult(name, result=self.fn(name))
+        except Exception as err:
+            return StepResult(name, error=err, trace=traceback.format_exc())
+
+
+def run_levels(levels, fn, jobs=DEFAULT_JOBS, on_level_done=None):
+    """
+    Call fn(name) for every name of each level using a bounded thread pool. Names in a level
+    run in parallel, the next level is only started if every call in the previous one succeeded.
+    Returns the list of StepResults for the levels that were run.
+    """
+    results = []
+    for level in levels:
+        if not level:
+            continue
+        level_results = parallel_map(_Step(fn), level, jobs)
+        results.extend(level_results)
+        if on_level_done:
+            on_level_done(level_results)
+        if any(result.failed for result in level_results):
+            break
+    return results
+
+
+def print_failures(results, out=sys.stderr):
+    for result in results:
+        if result.failed:
+            out.write("%s failed: %s\n%s\n" % (result.name, result.error, result.trace))
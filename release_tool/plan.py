@@ -0,0 +1,202 @@
+import os
+import json
+import hashlib
+import datetime
+import collections
+
+import tracing
+from bump_module import GITHUB_REPOS
+from conf import CONFIG
+from overlay import FileOverlay
+from tags import TagIndex
+from util import run_git, to_str
+
+PLAN_FORMAT = 1
+
+
+def hash_file(path, blob=False):
+    """sha1 of a file, or its git blob id if blob is set, None if it doesn't exist"""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha1()
+    if blob:
+        digest.update("blob %i\0" % os.path.getsize(path))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), ""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_repo_file(repo, path, blob=False):
+    """hash_file of a file as the repo reads it, which is at its ref if it has one"""
+    if repo.ref is None:
+        return hash_file(path, blob)
+    if not repo.exists(path):
+        return None
+    data = repo.read_file(path)
+    return hashlib.sha1(("blob %i\0" % len(data) if blob else "") + data).hexdigest()
+
+
+def get_branch_head(directory, branch):
+    return run_git(directory, ["rev-parse", "--verify", "refs/heads/%s" % branch]).strip()
+
+
+def get_checked_out_branch(directory):
+    """Name of the branch checked out in directory, None if HEAD is detached"""
+    # symbolic-ref exits with 1 for a detached HEAD
+    ref = run_git(directory, ["symbolic-ref", "-q", "HEAD"], ok_returncodes=(0, 1)).strip()
+    return ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else None
+
+
+def get_checked_out_branches(directory):
+    """Branches checked out in the repo's main working tree or any of its linked worktrees"""
+    output = run_git(directory, ["worktree", "list", "--porcelain"])
+    return {line[len("branch refs/heads/"):] for line in output.splitlines()
+            if line.startswith("branch refs/heads/")}
+
+
+class ReleasePlan(object):
+    """
+    Everything needed to ship a bump without recomputing it: the new versions, tags and
+    release notes, the new contents of every file, and the state of each repo the plan was
+    computed against.
+    """
+
+    def __init__(self, repos, overlay=None):
+        self.repos = collections.OrderedDict((entry["module"], entry) for entry in repos)
+        if overlay is None:
+            overlay = FileOverlay()
+            for entry in repos:
+                for edit in entry["files"]:
+                    if edit["tail_offset"] is None:
+                        overlay.write(edit["path"], edit["content"])
+                    else:
+                        overlay.write_head(edit["path"], edit["content"], edit["tail_offset"])
+        self.overlay = overlay
+
+    @classmethod
+    @tracing.traced("plan capture")
+    def from_stack(cls, stack):
+        overlay = stack.render()
+        entries = []
+        for module_name in stack.repo_sequence:
+            repo = GITHUB_REPOS[CONFIG.modules[module_name]]
+            if repo.ref is None:
+                branch = repo.git_repo.active_branch.name
+                head = get_branch_head(repo.directory, branch)
+            else:
+                # the checkout has to be at the ref's commit when the plan is applied
+                branch = CONFIG.settings[repo.repo_name]['branch']
+                head = repo.ref_commit
+            files = []
+            for path in stack.batch_files(module_name):
+                content, tail_offset = overlay.entry(path)
+                files.append({
+                    "path": path,
+                    "sha1": hash_repo_file(repo, path),
+                    # git blob id of the original, to restore it if it's already been written
+                    "blob": hash_repo_file(repo, path, True),
+                    "new_sha1": hashlib.sha1(overlay.read(path)).hexdigest(),
+                    "diff": overlay.diff(path),
+                    "content": content,
+                    "tail_offset": tail_offset,
+                })
+            entries.append({
+                "module": module_name,
+                "repo": repo.repo_name,
+                "directory": repo.directory,
+                "branch": branch,
+                "head": head,
+                "level": CONFIG.dependency_graph.level_of[module_name],
+                "current_version": str(repo.current_version),
+                "new_version": str(repo.new_version),
+                "tag": repo.new_version.tag,
+                "is_rc": repo.is_rc,
+                "message": "Bump version %s --> %s" % (repo.current_version, repo.new_version),
+                "release_notes": repo.release_msg,
+                "files": files,
+                # shipped by committing to the branch without the checkout
+                "worktree": not GITHUB_REPOS.at_branch,
+            })
+        return cls(entries, overlay)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as plan_file:
+            data = json.load(plan_file)
+        if data.get("format") != PLAN_FORMAT:
+            raise Exception("%s is not a release plan this version can apply" % path)
+        return cls.from_dict(to_str(data))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["repos"])
+
+    @classmethod
+    def merge(cls, plans):
+        entries = []
+        for plan in plans:
+            for module_name, entry in plan.repos.iteritems():
+                if any(other["module"] == module_name for other in entries):
+                    raise Exception("%s is part of more than one plan" % module_name)
+                entries.append(entry)
+        return cls(entries)
+
+    def to_dict(self):
+        return {
+            "format": PLAN_FORMAT,
+            "created": datetime.datetime.utcnow().isoformat(),
+            "repos": list(self.repos.itervalues()),
+        }
+
+    def save(self, path):
+        with open(path, "w") as plan_file:
+            json.dump(self.to_dict(), plan_file, indent=2, sort_keys=True)
+
+    @property
+    def levels(self):
+        levels = collections.OrderedDict()
+        for entry in sorted(self.repos.itervalues(), key=lambda entry: entry["level"]):
+            levels.setdefault(entry["level"], []).append(entry["module"])
+        return levels.values()
+
+    @property
+    def is_release(self):
+        return any(not entry["is_rc"] for entry in self.repos.itervalues())
+
+    def files(self, module_name):
+        return [edit["path"] for edit in self.repos[module_name]["files"]]
+
+    def check_preconditions(self, module_names=None, allow_written=False):
+        """
+        Raise if any repo or file changed since the plan was computed. With allow_written files
+        already at their planned contents pass too, an interrupted ship wrote them.
+        """
+        problems = []
+        for module_name, entry in self.repos.iteritems():
+            if module_names is not None and module_name not in module_names:
+                continue
+            head = get_branch_head(entry["directory"], entry["branch"])
+            if head != entry["head"]:
+                problems.append("%s: %s moved from %s to %s" % (module_name, entry["branch"],
+                                                               entry["head"][:8], head[:8]))
+            if entry.get("worktree", True):
+                if get_checked_out_branch(entry["directory"]) != entry["branch"]:
+                    # the files are committed from the checkout and its index is updated
+                    problems.append("%s: %s isn't checked out in %s" % (
+                        module_name, entry["branch"], entry["directory"]))
+            elif entry["branch"] in get_checked_out_branches(entry["directory"]):
+                # moving it would leave that checkout's index undoing the release
+                problems.append("%s: %s is checked out, ship it without --no-worktree" % (
+                    module_name, entry["branch"]))
+            if entry["tag"] in TagIndex(entry["directory"]):
+                problems.append("%s: tag %s already exists" % (module_name, entry["tag"]))
+            # without a worktree the files are read at the head, which was just checked
+            for edit in (entry["files"] if entry.get("worktree", True) else []):
+                sha1 = hash_file(edit["path"])
+                if sha1 != edit["sha1"] and not (allow_written and sha1 is not None and
+                                            sha1 == edit.get("new_sha1")):
+                    problems.append("%s: %s changed" % (module_name, edit["path"]))
+        if problems:
+            raise Exception("The plan no longer applies:\n  %s" % "\n  ".join(problems))
+
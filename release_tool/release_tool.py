@@ -2,37 +2,144 @@
 
 import os
 import sys
-import subprocess
 import argparse
-from termcolor import colored
-from bump_module import GITHUB_REPOS, MODULES, get_update_ops, pushd
+import functools
+import time
 
+_IMPORT_START = time.time()
 
-def release_tool(name, part="candidate", bump_deps=False):
-    stack = get_update_ops(name, part, bump_deps)
-    touched = stack.files_touched
-    repos = stack.repos_touched
-    print "%i operations, %i files touched, %i repos touched" % (len(stack), len(touched),
-                                                                 len(repos))
-    for f in touched:
-        print "    %s" % f
+from bump_module import GITHUB_REPOS, METADATA_CACHE, GITHUB_CACHE, format_requirement, \
+    get_update_ops, prefetch_github_repos
+import conf
+import gh
+import journal as journal_module
+import status
+import tracing
+from commit import commit_files, commit_written_blobs, write_blob, write_blobs
+from journal import Journal
+from overlay import atomic_write
+from pins import PinMatrix
+from plan import ReleasePlan, get_branch_head, get_checked_out_branches, hash_file
+from tags import TagIndex
+from util import colored, run_git
+from pipeline import DEFAULT_JOBS, run_levels, print_failures
 
-    print ""
-    released = False
+_IMPORT_END = time.time()
+
+
+def ship_repo(module_name, journal, atomic_push=True):
+    """Run the git steps of shipping a repo that the journal doesn't have as done yet"""
+    plan = journal.plan
+    entry = plan.repos[module_name]
+    repo = GITHUB_REPOS[entry["repo"]]
+    directory, branch, tag = entry["directory"], entry["branch"], entry["tag"]
+    paths = plan.files(module_name)
+    worktree = entry.get("worktree", True)
+
+    if not journal.done(module_name, "write"):
+        with tracing.span("write files", repo=module_name):
+            if worktree:
+                edits, result = [], {}
+                for edit in entry["files"]:
+                    sha1 = hash_file(edit["path"])
+                    if sha1 == edit["sha1"]:
+                        edits.append(edit)
+                    elif sha1 is not None and sha1 == edit.get("new_sha1"):
+                        # written by an interrupted run, which stored the original before
+                        # writing it
+                        result[edit["path"]] = edit.get("blob")
+                    else:
+                        # committing it would ship whatever is in the working tree
+                        raise Exception("%s changed since the plan was computed" % edit["path"])
+                existing = [edit["path"] for edit in edits if edit["sha1"] is not None]
+                result.update(zip(existing, write_blobs(directory, existing)))
+                result.update((edit["path"], None) for edit in edits if edit["sha1"] is None)
+                plan.overlay.flush([edit["path"] for edit in edits])
+            else:
+                # the new contents only go to the object store, the checkout isn't touched
+                result = {os.path.relpath(path, directory):
+                          write_blob(directory, plan.overlay.read(path)) for path in paths}
+        journal.record(module_name, "write", result)
 
-    bump_sequence = stack.repo_sequence
+    if not journal.done(module_name, "commit"):
+        with tracing.span("commit", repo=module_name):
+            head = get_branch_head(directory, branch)
+            if head != entry["head"] and \
+                    get_branch_head(directory, branch + "^") == entry["head"]:
+                # committed by an interrupted run
+                commit = head
+            elif worktree:
+                commit = commit_files(directory, branch, paths, entry["message"])
+            elif branch in get_checked_out_branches(directory):
+                # checked out since the plan was checked, e.g. before a resume
+                raise Exception("%s is checked out in %s, it can't be committed to without the "
+                                "checkout" % (branch, directory))
+            else:
+                commit = commit_written_blobs(directory, branch,
+                                              journal.result(module_name, "write"),
+                                              entry["message"])
+        journal.record(module_name, "commit", commit)
+    commit = journal.result(module_name, "commit")
 
-    for repo_name in bump_sequence:
-        repo = GITHUB_REPOS[MODULES[repo_name]]
-        git_repo = repo.git_repo_v3
-        print u"push %s --> %s" % (colored(repo.new_version.tag, "blue"), git_repo.git_url)
-        if not repo.is_rc:
+    if not journal.done(module_name, "tag"):
+        with tracing.span("tag", repo=module_name):
+            if tag not in TagIndex(directory):
+                repo.git_repo.create_tag(tag, commit, tag, False)
+            repo.tags.add(tag)
+        journal.record(module_name, "tag")
+
+    if not journal.done(module_name, "push"):
+        with tracing.span("push", repo=module_name):
+            repo.push_release(branch, tag, atomic_push)
+        journal.record(module_name, "push")
+    return commit
+
+
+def create_release(module_name, journal):
+    entry = journal.plan.repos[module_name]
+    if not journal.done(module_name, "release"):
+        with tracing.span("github release", repo=module_name):
+            GITHUB_REPOS[entry["repo"]].git_repo_v3.create_git_release(
+                entry["tag"], entry["tag"], entry["release_notes"], draft=True,
+                prerelease=entry["is_rc"])
+        journal.record(module_name, "release")
+
+
+def rollback_repo(journal, module_name):
+    """Undo the local steps of shipping a repo, newest first"""
+    entry = journal.plan.repos[module_name]
+    directory, branch = entry["directory"], entry["branch"]
+    worktree = entry.get("worktree", True)
+    if journal.done(module_name, "tag"):
+        run_git(directory, ["tag", "-d", entry["tag"]])
+    if journal.done(module_name, "commit"):
+        # fails if anything was committed on top of the bump since
+        run_git(directory, ["update-ref", "-m", "release-tool: rollback", "refs/heads/" + branch,
+                            entry["head"], journal.result(module_name, "commit")])
+        if worktree:
+            run_git(directory, ["reset", "-q", entry["head"], "--"] +
+                    [os.path.relpath(path, directory) for path in journal.plan.files(module_name)])
+    if journal.done(module_name, "write") and worktree:
+        for path, sha in journal.result(module_name, "write").iteritems():
+            if sha is None:
+                os.remove(path)
+            else:
+                atomic_write(path, run_git(directory, ["cat-file", "blob", sha]))
+    journal.forget(module_name)
+
+
+def print_plan(plan):
+    prefetch_github_repos(plan.repos)
+    for module_name, entry in plan.repos.iteritems():
+        git_repo = GITHUB_REPOS[entry["repo"]].git_repo_v3
+        print u"push %s --> %s" % (colored(entry["tag"], "blue"), git_repo.git_url)
+        if not entry["is_rc"]:
             print colored("release notes:", "green")
-            print repo.release_msg
+            print entry["release_notes"]
             print ""
-            if not released:
-                released = True
 
+
+def confirm(plan):
     first_prompt = ""
     while first_prompt.lower() not in ["y", "yes", "n", "no"]:
         first_prompt = raw_input("look good? y/n: ")
@@ -41,7 +148,7 @@ def release_tool(name, part="candidate", bump_deps=False):
     else:
         exit()
 
-    if released:
+    if plan.is_release:
         second_prompt = ""
         msg = "this will push a release... is this what you mean to do?\n" \
               "type \"ship it\" or \"quit\"...\n"
@@ -52,57 +159,342 @@ def release_tool(name, part="candidate", bump_deps=False):
         else:
             exit()
 
-    for op in iter(stack):
-        pass
 
-    for repo_name in bump_sequence:
-        repo = GITHUB_REPOS[MODULES[repo_name]]
-        repo.git_repo.index.add([path for path in [os.path.join(repo.directory, repo.module_name,
-                                                                '__init__.py'),
-                                 os.path.join(repo.directory, 'setup.py'),
-                                 os.path.join(repo.directory, 'requirements.txt')]
-                                 if os.path.isfile(path)], force=True)
-        if not repo.is_rc:
-            repo.git_repo.index.add([os.path.join(repo.directory, 'CHANGELOG.md')], force=True)
-        repo.git_repo.index.update()
-        bump_msg = "Bump version %s --> %s" % (repo.current_version, repo.new_version)
-        commit = repo.git_repo.commit(repo.git_repo.index.commit(message=bump_msg))
-
-        with pushd(repo.directory):
-            output = subprocess.check_output(['git', 'commit', '-s', '-S', '--amend', '--no-edit'])
-
-        tag = repo.git_repo.create_tag(repo.new_version.tag, repo.git_repo.head.ref,
-                                       repo.new_version.tag, False)
-        branch = repo.git_repo.active_branch
-        repo.git_repo.remote("origin").push(branch.name)
-        repo.git_repo.remote("origin").push(tag)
-        repo.git_repo_v3.create_git_release(repo.new_version.tag, repo.new_version.tag,
-                                            repo.release_msg, draft=True, prerelease=repo.is_rc)
-
-        print u"commit %s (%s)" % (colored(repo.module_name, "green"), commit)
-
-    if released:
+@tracing.traced("ship")
+def execute_plan(journal, jobs=DEFAULT_JOBS, atomic_push=True):
+    plan = journal.plan
+
+    def on_level_done(level_results):
+        for result in level_results:
+            if not result.failed:
+                print u"commit %s (%s)" % (colored(result.name, "green"), result.result)
+
+    ship = functools.partial(ship_repo, journal=journal, atomic_push=atomic_push)
+    results = run_levels(plan.levels, ship, jobs, on_level_done)
+    # draft releases don't depend on each other, they're all created at once at the end
+    pushed = [module_name for module_name in plan.repos
+              if journal.done(module_name, "push") and not journal.done(module_name, "release")]
+    release = functools.partial(create_release, journal=journal)
+    results += run_levels([pushed], release, gh.POOL_SIZE)
+    shipped = [module_name for module_name in plan.repos if journal.done(module_name, "release")]
+    if len(shipped) != len(plan.repos):
+        print_failures(results)
+        print colored(u"shipped %s, not shipped %s" % (
+            ", ".join(shipped) or "nothing",
+            ", ".join(r for r in plan.repos if r not in shipped)), 'red')
+        print "run release-tool resume to continue, or release-tool rollback to undo what " \
+              "hasn't been pushed"
+        sys.exit(1)
+    journal.finish()
+
+    if plan.is_release:
         print colored(u"shipped release", 'green') + u"🚀"
     else:
         print colored(u"shipped candidate", 'green') + u"🚚"
 
 
+def make_plan(name, part="candidate", bump_deps=False, incremental=False):
+    stack = get_update_ops(name, part, bump_deps, incremental)
+    touched = stack.render().paths
+    repos = stack.repos_touched
+    print "%i operations, %i files touched, %i repos touched" % (len(stack), len(touched),
+                                                                 len(repos))
+    for f in touched:
+        print "    %s" % f
+    print ""
+    return stack
+
+
+def release_tool(name, part="candidate", bump_deps=False, jobs=DEFAULT_JOBS, atomic_push=True,
+                 dry_run=False, incremental=False, assume_yes=False):
+    stack = make_plan(name, part, bump_deps, incremental)
+    if dry_run:
+        for diff in stack.overlay.diffs():
+            sys.stdout.write(diff)
+        return
+    plan = ReleasePlan.from_stack(stack)
+    plan.check_preconditions()
+    print_plan(plan)
+    if not assume_yes:
+        confirm(plan)
+        # the repos may have changed while the prompt was open
+        plan.check_preconditions()
+    execute_plan(Journal.start(plan), jobs, atomic_push)
+
+
+def release_notes(name, versions=None, deps=False):
+    repo = GITHUB_REPOS[conf.CONFIG.modules[name]]
+    notes = repo._changelog.get_notes(versions)
+    if not notes:
+        raise Exception("No changelog entry for %s %s" % (name, versions or ""))
+    print colored(name, "green")
+    print "\n\n".join(notes) + "\n"
+    if not deps:
+        return
+    # follow the pinned requirements up the dependency chain
+    to_visit, seen = [repo], {name}
+    while to_visit:
+        dependent = to_visit.pop(0)
+        for upstream, version in sorted(dependent.get_module_requires().iteritems()):
+            if upstream in seen:
+                continue
+            seen.add(upstream)
+            upstream_repo = GITHUB_REPOS[conf.CONFIG.modules[upstream]]
+            print colored(u"%s (pinned by %s)" % (upstream, dependent.module_name), "green")
+            upstream_notes = upstream_repo._changelog.get_notes(version)
+            if upstream_notes:
+                print "\n\n".join(upstream_notes) + "\n"
+            else:
+                # candidates don't get a changelog section of their own
+                print "no released notes for %s\n" % format_requirement(upstream, version)
+            to_visit.append(upstream_repo)
+
+
 def exit():
     print u"don't ship it! 🚚🚓"
     sys.exit()
 
 
-def main():
-    parser = argparse.ArgumentParser()
+def notes_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool notes")
+    parser.add_argument("name", type=str, help="python module name")
+    parser.add_argument("versions", nargs="?", type=str,
+                        help="version, range of versions as A..B, or a specifier such as "
+                             ">=1.2 (defaults to the latest)")
+    parser.add_argument("-d", "--deps", action="store_true",
+                        help="include the notes of the pinned versions of its dependencies")
+    args = parser.parse_args(argv)
+    release_notes(args.name, args.versions, args.deps)
+
+
+def status_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool status")
+    parser.add_argument("--json", action="store_true", help="print the status as json")
+    parser.add_argument("--fast", action="store_true",
+                        help="skip checking whether the working trees are dirty")
+    parser.add_argument("-j", "--jobs", default=DEFAULT_JOBS, type=int,
+                        help="number of repos to survey in parallel")
+    args = parser.parse_args(argv)
+    rows = status.survey([GITHUB_REPOS[repo_name] for repo_name in GITHUB_REPOS], args.fast,
+                         args.jobs)
+    print status.format_json(rows) if args.json else status.format_table(rows)
+
+
+def sync_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool sync")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="show the pin updates as diffs without writing them")
+    parser.add_argument("-j", "--jobs", default=DEFAULT_JOBS, type=int,
+                        help="number of repos to read in parallel")
+    args = parser.parse_args(argv)
+    matrix = PinMatrix([GITHUB_REPOS[repo_name] for repo_name in GITHUB_REPOS], args.jobs)
+    print matrix.format_table()
+    print ""
+    stale = matrix.drift()
+    if not stale:
+        print colored(u"all pins are up to date", "green")
+        return
+    for module_name, upstream, source, pin, version in stale:
+        print "%s %s: %s %s-->%s" % (module_name, source, upstream, pin,
+                                      colored(version, attrs=['bold']))
+    overlay = matrix.sync()
+    if args.dry_run:
+        for diff in overlay.diffs():
+            sys.stdout.write(diff)
+        return
+    overlay.flush()
+    print "%i files updated" % len(overlay.paths)
+
+
+def add_bump_arguments(parser):
     parser.add_argument("name", type=str, help="python module name")
     parser.add_argument("part", default="candidate", type=str,
                         help="major/minor/patch or candidate/release")
     parser.add_argument("-r", "--recurse_bump", default=True, action="store_true",
                         help="recurse bump dependencies")
+    parser.add_argument("--incremental", action="store_true",
+                        help="don't bump dependents without commits since their last tag")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't read or write the cached config, repository metadata and "
+                             "GitHub responses")
+    parser.add_argument("--ref",
+                        help="read every repo at this branch, tag or commit instead of from its "
+                             "working tree")
+    parser.add_argument("--no-worktree", action="store_true",
+                        help="read each repo at its configured branch and commit the release "
+                             "to it without touching the checkout")
+
+
+def apply_cache_arguments(args):
+    if args.no_cache:
+        conf.CONFIG.use_cache = False
+        METADATA_CACHE.enabled = False
+        GITHUB_CACHE.enabled = False
+
+
+def apply_ref_arguments(parser, args):
+    if args.ref and args.no_worktree:
+        parser.error("--no-worktree reads the configured branches, it can't be used with --ref")
+    GITHUB_REPOS.ref = args.ref
+    GITHUB_REPOS.at_branch = args.no_worktree
+
+
+def add_ship_arguments(parser):
+    parser.add_argument("-j", "--jobs", default=DEFAULT_JOBS, type=int,
+                        help="number of repos to commit, tag and push in parallel")
+    parser.add_argument("--push-mode", default="atomic", choices=["atomic", "separate"],
+                        help="push the branch and tag in one atomic push, or one at a time")
+
+
+def plan_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool plan")
+    add_bump_arguments(parser)
+    parser.add_argument("-o", "--output", required=True, help="file to write the plan to")
+    parser.add_argument("--offline", action="store_true",
+                        help="answer the GitHub lookups from the cache only")
+    args = parser.parse_args(argv)
+    apply_cache_arguments(args)
+    GITHUB_CACHE.offline = args.offline
+    apply_ref_arguments(parser, args)
+    stack = make_plan(args.name, args.part, args.recurse_bump, args.incremental)
+    plan = ReleasePlan.from_stack(stack)
+    plan.save(args.output)
+    print_plan(plan)
+    print "wrote the plan for %s to %s" % (", ".join(plan.repos), args.output)
+
+
+def apply_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool apply")
+    parser.add_argument("plans", nargs="+", help="plan files written by release-tool plan")
+    add_ship_arguments(parser)
+    args = parser.parse_args(argv)
+    plan = ReleasePlan.merge([ReleasePlan.load(path) for path in args.plans])
+    plan.check_preconditions()
+    print_plan(plan)
+    execute_plan(Journal.start(plan), args.jobs, args.push_mode == "atomic")
+
 
-    args = parser.parse_args()
+def resume_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool resume")
+    add_ship_arguments(parser)
+    args = parser.parse_args(argv)
+    journal = Journal.load()
+    for module_name in journal.plan.repos:
+        print "%s: %s" % (module_name, ", ".join(journal.completed(module_name)) or "not started")
+    # repos that were already touched have moved on from the plan's state
+    journal.plan.check_preconditions([module_name for module_name in journal.plan.repos
+                                      if not journal.completed(module_name)],
+                                     allow_written=True)
+    execute_plan(journal, args.jobs, args.push_mode == "atomic")
+
+
+def rollback_main(argv):
+    parser = argparse.ArgumentParser(prog="release-tool rollback")
+    parser.parse_args(argv)
+    journal = Journal.load()
+    for module_name in reversed(journal.plan.repos.keys()):
+        if journal.done(module_name, "push"):
+            print colored(u"%s was already pushed, leaving it" % module_name, "red")
+            continue
+        rollback_repo(journal, module_name)
+        print u"rolled back %s" % colored(module_name, "green")
+    unfinished = [module_name for module_name in journal.plan.repos
+                  if not journal.done(module_name, "release")]
+    if unfinished:
+        print "run release-tool resume to finish shipping %s" % ", ".join(unfinished)
+    else:
+        journal.finish()
+
+
+def bump_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="release-tool", usage="%(prog)s [global options] name part [options]\n"
+                                   "       %(prog)s [global options] <command> ...",
+        description="Bump a module and the modules that depend on it, then commit, tag and\n"
+                    "push each of them and draft their GitHub releases.",
+        epilog=format_commands(), parents=[get_global_parser()],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_bump_arguments(parser)
+    add_ship_arguments(parser)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="show the changes as diffs without writing or shipping anything")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="ship without asking for confirmation")
+
+    args = parser.parse_args(argv)
+    if args.ref and not args.dry_run:
+        parser.error("--ref only plans, use it with --dry-run or release-tool plan")
+    apply_cache_arguments(args)
+    apply_ref_arguments(parser, args)
     name, part, bump_deps = args.name, args.part, args.recurse_bump
-    release_tool(name, part, bump_deps)
+    release_tool(name, part, bump_deps, args.jobs, args.push_mode == "atomic", args.dry_run,
+                 args.incremental, args.yes)
+
+
+COMMANDS = {
+    "apply": apply_main,
+    "notes": notes_main,
+    "plan": plan_main,
+    "resume": resume_main,
+    "rollback": rollback_main,
+    "status": status_main,
+    "sync": sync_main,
+}
+
+COMMAND_HELP = [
+    ("status", "show the branch, version and stale pins of every repo"),
+    ("sync", "repin stale dependency pins to the current upstream versions"),
+    ("notes", "print the changelog notes of a module's releases"),
+    ("plan", "compute a bump and save it to a plan file without shipping it"),
+    ("apply", "ship plan files written by release-tool plan"),
+    ("resume", "finish shipping an interrupted release"),
+    ("rollback", "undo what an interrupted release hasn't pushed yet"),
+]
+
+
+def format_commands():
+    lines = ["commands:"]
+    lines.extend("  %-10s%s" % command for command in COMMAND_HELP)
+    lines.append("")
+    lines.append("run release-tool <command> --help for the arguments of a command")
+    return "\n".join(lines)
+
+
+def get_global_parser():
+    """The options every command takes, they're parsed before the command is picked"""
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group("global options")
+    group.add_argument("--config", help="config file to use instead of ~/.release-tool.yml")
+    group.add_argument("--profile", action="store_true",
+                       help="time each phase, print a summary and write a trace file")
+    group.add_argument("--trace-file", default=tracing.DEFAULT_TRACE_PATH,
+                       help="where --profile writes the Chrome trace")
+    group.add_argument("--journal",
+                       help="journal file to use instead of ~/.release-tool-journal.json, "
+                            "releases running at the same time each need their own")
+    return parser
+
+
+def main():
+    options, argv = get_global_parser().parse_known_args(sys.argv[1:])
+    conf.CONFIG.path = options.config
+    if options.journal:
+        journal_module.JOURNAL_PATH = os.path.abspath(options.journal)
+    if options.profile:
+        tracing.enable()
+        tracing.add_span("imports", _IMPORT_START, _IMPORT_END)
+    try:
+        with tracing.span("run"):
+            if argv and argv[0] in COMMANDS:
+                COMMANDS[argv[0]](argv[1:])
+            else:
+                bump_main(argv)
+    finally:
+        if options.profile:
+            print ""
+            print tracing.summary()
+            tracing.write_trace(options.trace_file)
+            print "trace written to %s" % options.trace_file
 
 
 if __name__ == "__main__":
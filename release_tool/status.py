@@ -0,0 +1,57 @@
+import json
+
+from bump_module import format_requirement, pin_matches
+from pipeline import DEFAULT_JOBS
+from util import parallel_map
+
+COLUMNS = ["module", "branch", "dirty", "version", "stale pins"]
+
+
+def survey_repo(repo, fast=False):
+    try:
+        branch = repo.git_repo.active_branch.name
+    except TypeError:
+        branch = "(detached)"
+    return {
+        "repo": repo.repo_name,
+        "module": repo.module_name,
+        "branch": branch,
+        # is_dirty walks the whole working tree
+        "dirty": None if fast else repo.is_dirty,
+        "version": repr(repo.current_version),
+        "requires": repo.get_module_requires(),
+    }
+
+
+def survey(repos, fast=False, jobs=DEFAULT_JOBS):
+    """Survey the given repos concurrently, the slow git calls run in a thread pool"""
+    rows = parallel_map(lambda repo: survey_repo(repo, fast), repos, jobs)
+    versions = {row["module"]: row["version"] for row in rows}
+    for row in rows:
+        row["stale pins"] = {module_name: {"pinned": pinned, "current": versions[module_name]}
+                             for module_name, pinned in row["requires"].iteritems()
+                             if module_name in versions and
+                             not pin_matches(pinned, versions[module_name])}
+    return rows
+
+
+def format_json(rows):
+    return json.dumps(rows, indent=2, sort_keys=True)
+
+
+def format_table(rows):
+    def cell(row, column):
+        value = row[column]
+        if column == "dirty":
+            return "?" if value is None else ("dirty" if value else "clean")
+        if column == "stale pins":
+            return ", ".join("%s (%s)" % (format_requirement(module_name, pin["pinned"]),
+                                          pin["current"])
+                             for module_name, pin in sorted(value.iteritems())) or "-"
+        return value
+
+    table = [COLUMNS] + [[cell(row, column) for column in COLUMNS]
+                         for row in sorted(rows, key=lambda row: row["module"])]
+    widths = [max(len(line[i]) for line in table) for i in range(len(COLUMNS))]
+    return "\n".join("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip()
+                     for line in table)
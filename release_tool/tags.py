@@ -0,0 +1,34 @@
+from util import run_git
+
+
+def load_tags(directory):
+    # show-ref exits with 1 when there are no tags at all
+    output = run_git(directory, ["show-ref", "--tags"], ok_returncodes=(0, 1))
+    return [line.split(" ", 1)[1][len("refs/tags/"):] for line in output.splitlines()]
+
+
+class TagIndex(object):
+    """Set of the tag names in a repo, loaded with a single show-ref"""
+
+    def __init__(self, directory, tags=None):
+        self.directory = directory
+        self._tags = set(tags) if tags is not None else None
+
+    @property
+    def names(self):
+        if self._tags is None:
+            self._tags = set(load_tags(self.directory))
+        return self._tags
+
+    def __contains__(self, tag):
+        return tag in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, tag):
+        if self._tags is not None:
+            self._tags.add(tag)
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import functools
+import threading
+
+DEFAULT_TRACE_PATH = "release-tool-trace.json"
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_span(self.name, self.start, time.time(), **self.args)
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def span(name, **args):
+    """Time the enclosed block, a shared no-op context manager is returned when disabled"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name, describe=None):
+    """Decorator timing every call, describe(*args) gives the span's arguments"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, describe(*args) if describe else {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_span(name, start, end, **args):
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": int(start * 1e6),
+        "dur": int((end - start) * 1e6),
+        "pid": os.getpid(),
+        "tid": threading.current_thread().ident,
+        "args": args,
+    }
+    with _lock:
+        _events.append(event)
+
+
+def totals():
+    """span name -> (total microseconds, number of spans, longest span in microseconds)"""
+    result = {}
+    for event in _events:
+        total, count, longest = result.get(event["name"], (0, 0, 0))
+        result[event["name"]] = (total + event["dur"], count + 1, max(longest, event["dur"]))
+    return result
+
+
+def summary():
+    """Table of the total, count and longest duration of every span name, slowest first"""
+    table = [["span", "calls", "total ms", "max ms"]]
+    spans = sorted(totals().iteritems(), key=lambda item: -item[1][0])
+    for name, (total, count, longest) in spans:
+        table.append([name, str(count), "%.1f" % (total / 1e3), "%.1f" % (longest / 1e3)])
+    widths = [max(len(line[i]) for line in table) for i in range(len(table[0]))]
+    return "\n".join("  ".join(value.ljust(width) if i == 0 else value.rjust(width)
+                               for i, (value, width) in enumerate(zip(line, widths)))
+                     for line in table)
+
+
+def write_trace(path=DEFAULT_TRACE_PATH):
+    """Write the spans in the Chrome trace event format (chrome://tracing, Perfetto)"""
+    with open(path, "w") as trace_file:
+        json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, trace_file)
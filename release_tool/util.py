@@ -0,0 +1,57 @@
+import subprocess
+from multiprocessing.pool import ThreadPool
+
+
+class lazy_property(object):
+    """Compute an attribute on first access and store it on the instance"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.__name__ = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.__name__] = self.fn(obj)
+        return value
+
+
+def colored(text, color=None, on_color=None, attrs=None):
+    """termcolor.colored, imported on first use"""
+    from termcolor import colored
+    return colored(text, color, on_color, attrs)
+
+
+def to_str(value):
+    """Encode the unicode strings json gives back as utf-8, the tool works with strs"""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, list):
+        return [to_str(item) for item in value]
+    if isinstance(value, dict):
+        return {to_str(k): to_str(v) for k, v in value.iteritems()}
+    return value
+
+
+def parallel_map(fn, items, jobs):
+    """map fn over items with at most jobs threads, results are in the order of items"""
+    items = list(items)
+    if not items:
+        return []
+    pool = ThreadPool(max(1, min(jobs, len(items))))
+    try:
+        return pool.map(fn, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_git(directory, args, env=None, stdin=None, ok_returncodes=(0, )):
+    process = subprocess.Popen(["git"] + list(args), cwd=directory, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate(stdin)
+    if process.returncode not in ok_returncodes:
+        raise Exception("git %s failed in %s: %s" % (args[0], directory, stderr.strip()))
+    return stdout
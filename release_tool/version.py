@@ -0,0 +1,184 @@
+import re
+import sys
+
+VERSION_RE = re.compile(r'^v?(\d+)\.(\d+)(?:\.(\d+))?(?:\.?rc\.?(\d+))?$')
+SPECIFIER_RE = re.compile(r'^\s*(==|!=|~=|>=|<=|>|<)?\s*(v?[\d.]+(?:\.?rc\.?\d+)?)\s*$')
+
+# version string -> Version, versions are immutable so parsed instances are shared
+_PARSE_CACHE = {}
+
+
+class Version(object):
+    __slots__ = ('major', 'minor', 'patch', 'candidate', '_key')
+    candidate_separator = "rc"
+
+    def __init__(self, major, minor, patch, candidate=None):
+        set_attribute = super(Version, self).__setattr__
+        set_attribute('major', major)
+        set_attribute('minor', minor)
+        set_attribute('patch', patch)
+        set_attribute('candidate', candidate or None)
+        # a release sorts after all of its candidates
+        set_attribute('_key', (major, minor, patch, candidate or float('inf')))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Version is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Version is immutable")
+
+    def __repr__(self):
+        v = "%i.%i.%i" % (self.major, self.minor, self.patch)
+        if self.candidate:
+            v += "rc%i" % self.candidate
+        return v
+
+    def __str__(self):
+        return repr(self)
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __eq__(self, other):
+        return isinstance(other, Version) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return self._key < other._key
+
+    def __le__(self, other):
+        return self._key <= other._key
+
+    def __gt__(self, other):
+        return self._key > other._key
+
+    def __ge__(self, other):
+        return self._key >= other._key
+
+    def __reduce__(self):
+        return Version, (self.major, self.minor, self.patch, self.candidate)
+
+    @classmethod
+    def parse(cls, version_string):
+        """Parse X.Y.Z, X.Y.ZrcN, X.Y (as X.Y.0) or any of them prefixed with v"""
+        version = _PARSE_CACHE.get(version_string)
+        if version is None:
+            match = VERSION_RE.match(version_string.strip())
+            if not match:
+                raise ValueError("Invalid version: %s" % version_string)
+            major, minor, patch, candidate = match.groups()
+            version = cls(int(major), int(minor), int(patch or 0),
+                          int(candidate) if candidate else None)
+            _PARSE_CACHE[version_string] = version
+        return version
+
+    @property
+    def is_candidate(self):
+        return False if not self.candidate else True
+
+    @property
+    def is_release(self):
+        return True if not self.candidate else False
+
+    @property
+    def tag(self):
+        return "v%s" % self
+
+    def release(self):
+        if not self.is_candidate:
+            print "there is no candidate to release"
+            sys.exit(1)
+        return Version(self.major, self.minor, self.patch)
+
+    def bump_candidate(self, major=None, minor=None, patch=None):
+        """Return the next candidate version"""
+        if not major and not minor and not patch and self.is_release:
+            patch = True
+        is_version_bump = True if (major or minor or patch) else False
+        v_major, v_minor, v_patch, candidate = self.major, self.minor, self.patch, self.candidate
+
+        if major:
+            v_major, v_minor, v_patch = v_major + 1, 0, 0
+        elif minor:
+            v_minor, v_patch = v_minor + 1, 0
+        elif patch:
+            v_patch += 1
+        if is_version_bump:
+            candidate = 0
+        return Version(v_major, v_minor, v_patch, candidate + 1)
+
+    def bump_release(self, major=None, minor=None, patch=None):
+        """Return the next release version, releasing the current candidate if there is one"""
+        v_major, v_minor, v_patch, candidate = self.major, self.minor, self.patch, self.candidate
+        if not major and not minor and not patch and self.is_release:
+            patch = True
+        elif self.is_candidate:
+            candidate = None
+
+        if major:
+            v_major, v_minor, v_patch = v_major + 1, 0, 0
+        elif minor:
+            v_minor, v_patch = v_minor + 1, 0
+        elif patch:
+            v_patch += 1
+            candidate = None
+        return Version(v_major, v_minor, v_patch, candidate)
+
+
+class Specifier(object):
+    """A single version clause such as ==1.2.3, >=1.2 or ~=1.2.3"""
+
+    def __init__(self, spec):
+        match = SPECIFIER_RE.match(spec)
+        if not match:
+            raise ValueError("Invalid version specifier: %s" % spec)
+        self.operator = match.group(1) or "=="
+        release, _, candidate = match.group(2).lstrip("v").partition("rc")
+        self.precision = len(release.rstrip(".").split("."))
+        if self.precision == 1:
+            # <2 means <2.0.0
+            release += ".0"
+        self.version = Version.parse(release.rstrip(".") + ("rc" + candidate if candidate else ""))
+        if self.operator == "~=" and self.precision < 2:
+            raise ValueError("~= needs at least two version components: %s" % spec)
+
+    def __repr__(self):
+        return "%s%s" % (self.operator, self.version)
+
+    def contains(self, version):
+        if self.operator == "==":
+            return version == self.version
+        if self.operator == "!=":
+            return version != self.version
+        if self.operator == ">=":
+            return version >= self.version
+        if self.operator == "<=":
+            return version <= self.version
+        if self.operator == ">":
+            return version > self.version
+        if self.operator == "<":
+            return version < self.version
+        # ~=X.Y.Z is >=X.Y.Z with X.Y fixed, ~=X.Y is >=X.Y with X fixed
+        prefix = (self.version.major, self.version.minor, self.version.patch)[:self.precision - 1]
+        return version >= self.version and \
+            (version.major, version.minor, version.patch)[:len(prefix)] == prefix
+
+
+class SpecifierSet(object):
+    """Comma separated specifiers that all have to match"""
+
+    def __init__(self, specs):
+        self.specifiers = [Specifier(spec) for spec in specs.split(",") if spec.strip()]
+
+    def __repr__(self):
+        return ",".join(repr(specifier) for specifier in self.specifiers)
+
+    def contains(self, version):
+        return all(specifier.contains(version) for specifier in self.specifiers)
+
+
+def is_specifier(spec):
+    return spec.lstrip()[:1] in ("=", "!", "~", ">", "<")
+
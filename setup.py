@@ -4,7 +4,7 @@ from setuptools import setup, find_packages
 
 requires = [
     "GitPython",
-    "pygithub",
+    "requests",
 ]
 
 console_scripts = [
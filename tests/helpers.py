@@ -0,0 +1,147 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import StringIO
+import subprocess
+
+from release_tool import bump_module, catfile, conf, plan
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "test",
+    "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "test",
+    "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def git(directory, *args):
+    env = dict(os.environ, **GIT_ENV)
+    process = subprocess.Popen(["git"] + list(args), cwd=directory, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    if process.returncode:
+        raise Exception("git %s failed in %s: %s" % (args[0], directory, stderr.strip()))
+    return stdout
+
+
+def make_repo(directory, files, remote=None):
+    """A repo on master with a single commit of files (path -> contents), and a bare origin"""
+    os.makedirs(directory)
+    git(directory, "init", "-q")
+    git(directory, "symbolic-ref", "HEAD", "refs/heads/master")
+    # the release tool's own git commands don't get GIT_ENV
+    git(directory, "config", "user.name", GIT_ENV["GIT_COMMITTER_NAME"])
+    git(directory, "config", "user.email", GIT_ENV["GIT_COMMITTER_EMAIL"])
+    for path, contents in files.iteritems():
+        path = os.path.join(directory, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(contents)
+    git(directory, "add", "-A")
+    git(directory, "commit", "-q", "-m", "initial commit")
+    if remote:
+        git(os.path.dirname(remote), "init", "-q", "--bare", remote)
+        git(directory, "remote", "add", "origin", remote)
+        git(directory, "push", "-q", "origin", "master")
+    return directory
+
+
+# signs anything with a fixed signature so release commits can be signed without a key
+FAKE_GPG = """#!/bin/sh
+cat >/dev/null
+echo "[GNUPG:] SIG_CREATED D 1 8 00 0 0" >&2
+printf -- "-----BEGIN PGP SIGNATURE-----\\nfake\\n-----END PGP SIGNATURE-----\\n"
+"""
+
+CHANGELOG = """# Changelog
+
+## [Unreleased]
+### Fixed
+  * fixed a thing in %s
+  *
+
+
+## [1.0.0] - 2017-01-01
+### Added
+ * first release
+"""
+
+
+class FleetTestCase(unittest.TestCase):
+    """
+    A configured fleet of two repos, alpha and beta pinning alpha==1.0.0, each on master with a
+    v1.0.0 tag and a bare remote standing in for GitHub. The release tool's config and repo
+    registry point at it for the duration of a test.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        gpg = os.path.join(self.directory, "gpg")
+        with open(gpg, "w") as f:
+            f.write(FAKE_GPG)
+        os.chmod(gpg, 0o755)
+        self.repo_dirs = {
+            "alpha": self.make_module("alpha", "requires = ['six']\n", "", gpg),
+            "beta": self.make_module(
+                "beta", "requires = [\n    'six',\n    'alpha==1.0.0',\n]\n",
+                "git+https://github.com/test/alpha.git@v1.0.0#egg=alpha\n", gpg),
+        }
+        config_path = os.path.join(self.directory, "release-tool.yml")
+        with open(config_path, "w") as f:
+            f.write("alpha:\n  path: %s\n  remote: test\n" % self.repo_dirs["alpha"])
+            f.write("beta:\n  path: %s\n  remote: test\n  depends on: [alpha]\n" %
+                    self.repo_dirs["beta"])
+        config = conf.Config(config_path)
+        config.use_cache = False
+        self._config = bump_module.CONFIG, plan.CONFIG
+        bump_module.CONFIG = plan.CONFIG = config
+        self._metadata_cache = bump_module.METADATA_CACHE.enabled
+        bump_module.METADATA_CACHE.enabled = False
+        self.use_registry()
+
+    def tearDown(self):
+        bump_module.CONFIG, plan.CONFIG = self._config
+        bump_module.METADATA_CACHE.enabled = self._metadata_cache
+        self.use_registry()
+        catfile.close_readers()
+        shutil.rmtree(self.directory)
+
+    def make_module(self, name, requires, requirements, gpg):
+        setup = "from setuptools import setup\n\n%s\nsetup(name='%s', install_requires=requires)\n"
+        directory = make_repo(os.path.join(self.directory, name), {
+            "%s/__init__.py" % name: '__version__ = "1.0.0"\n',
+            "setup.py": setup % (requires, name),
+            "requirements.txt": requirements,
+            "CHANGELOG.md": CHANGELOG % name,
+        }, os.path.join(self.directory, "%s.git" % name))
+        git(directory, "config", "gpg.program", gpg)
+        git(directory, "tag", "v1.0.0")
+        return directory
+
+    def use_registry(self, ref=None, at_branch=False):
+        """Forget the repos read so far, they're read again at ref or at their branch"""
+        registry = bump_module.GITHUB_REPOS
+        registry._repos.clear()
+        registry.ref, registry.at_branch = ref, at_branch
+
+    def read(self, module_name, path):
+        with open(os.path.join(self.repo_dirs[module_name], path), "r") as f:
+            return f.read()
+
+    def write(self, module_name, path, contents):
+        with open(os.path.join(self.repo_dirs[module_name], path), "w") as f:
+            f.write(contents)
+
+    def make_stack(self, name="alpha", part="candidate", bump_deps=True):
+        """The stack of a bump of name and its dependents, with what it prints swallowed"""
+        stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+        try:
+            return bump_module.get_update_ops(name, part, bump_deps)
+        finally:
+            sys.stdout = stdout
+
+    def make_plan(self, name="alpha", part="candidate", bump_deps=True):
+        return plan.ReleasePlan.from_stack(self.make_stack(name, part, bump_deps))
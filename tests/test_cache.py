@@ -0,0 +1,120 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from release_tool.cache import MetadataCache, ResponseCache, get_fingerprint
+from tests.helpers import git, make_repo
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = MetadataCache(os.path.join(self.directory, "cache"), max_bytes=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def entries(self):
+        return sorted(os.listdir(self.cache.directory))
+
+    def test_update(self):
+        self.cache.update("/repo", "abc", {"version": "1.0.0"})
+        self.cache.update("/repo", "abc", {"tags": ["v1.0.0"]})
+        self.assertEqual(self.cache.get("/repo", "abc"), {"version": "1.0.0", "tags": ["v1.0.0"]})
+        self.assertEqual(self.cache.get("/repo", "def"), {})
+        self.cache.enabled = False
+        self.assertEqual(self.cache.get("/repo", "abc"), {})
+
+    def test_evicted_once(self):
+        for i in range(10):
+            self.cache.update("/repo", str(i), {"padding": "x" * 20})
+        # only the first write evicts, the rest of the run isn't slowed down by it
+        self.assertEqual(len(self.entries()), 10)
+        cache = MetadataCache(self.cache.directory, max_bytes=100)
+        cache.update("/repo", "new", {})
+        self.assertTrue(sum(os.path.getsize(os.path.join(cache.directory, name))
+                            for name in self.entries()) <= 100 + len("{}"))
+        self.assertEqual(cache.get("/repo", "new"), {})
+
+    def test_evict_entries_removed_meanwhile(self):
+        for i in range(10):
+            self.cache.update("/repo", str(i), {"padding": "x" * 20})
+        remove, listdir = os.remove, os.listdir
+
+        def listdir_then_remove(path):
+            names = listdir(path)
+            # another thread or process evicts everything in between
+            for name in names:
+                remove(os.path.join(path, name))
+            return names
+
+        os.listdir = listdir_then_remove
+        try:
+            self.cache.evict()
+        finally:
+            os.listdir = listdir
+        self.assertEqual(self.entries(), [])
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(os.path.join(self.directory, "github"), ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def age(self, url, seconds):
+        path = self.cache._entry_path(url)
+        os.utime(path, (time.time() - seconds, time.time() - seconds))
+
+    def test_update(self):
+        self.assertIsNone(self.cache.get("https://api/repos/a/b"))
+        self.cache.update("https://api/repos/a/b", '"etag"', None, {"full_name": "a/b"})
+        self.assertEqual(self.cache.get("https://api/repos/a/b"), {
+            "url": "https://api/repos/a/b", "etag": '"etag"', "last_modified": None,
+            "data": {"full_name": "a/b"}})
+
+    def test_ttl(self):
+        self.cache.update("https://api/repos/a/b", '"etag"', None, {})
+        self.age("https://api/repos/a/b", 50)
+        # validating an entry restarts its ttl
+        self.cache.refresh("https://api/repos/a/b")
+        self.assertFalse(self.cache._is_expired(self.cache._entry_path("https://api/repos/a/b")))
+        self.age("https://api/repos/a/b", 61)
+        self.assertIsNone(self.cache.get("https://api/repos/a/b"))
+        self.cache.update("https://api/repos/a/b", '"etag"', None, {})
+        self.cache.update("https://api/repos/c/d", '"etag"', None, {})
+        self.age("https://api/repos/c/d", 61)
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.cache.directory),
+                         [os.path.basename(self.cache._entry_path("https://api/repos/a/b"))])
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repo_dir = make_repo(os.path.join(self.directory, "module"),
+                                  {"setup.py": "requires = []\n"})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_changes(self):
+        setup_py = os.path.join(self.repo_dir, "setup.py")
+        fingerprint = get_fingerprint(self.repo_dir, [setup_py])
+        self.assertEqual(get_fingerprint(self.repo_dir, [setup_py]), fingerprint)
+        git(self.repo_dir, "tag", "v1.0.0")
+        tagged = get_fingerprint(self.repo_dir, [setup_py])
+        self.assertNotEqual(tagged, fingerprint)
+        with open(setup_py, "a") as f:
+            f.write("requires += ['six']\n")
+        self.assertNotEqual(get_fingerprint(self.repo_dir, [setup_py]), tagged)
+        self.assertNotEqual(get_fingerprint(self.repo_dir, [], "0" * 40),
+                            get_fingerprint(self.repo_dir, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from release_tool.bump_module import GITHUB_REPOS
+from release_tool.catfile import CatFileReader
+from tests.helpers import FleetTestCase, git, make_repo
+
+
+class TestCatFileReader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repo_dir = make_repo(os.path.join(self.directory, "module"),
+                                  {"setup.py": "requires = []\n", "empty.txt": ""})
+        git(self.repo_dir, "tag", "v1.0.0")
+        self.reader = CatFileReader(self.repo_dir)
+
+    def tearDown(self):
+        self.reader.close()
+        shutil.rmtree(self.directory)
+
+    def test_read(self):
+        self.assertEqual(self.reader.read_file("v1.0.0", "setup.py"), "requires = []\n")
+        self.assertEqual(self.reader.read_file("HEAD", "empty.txt"), "")
+        self.assertIsNone(self.reader.read_file("v1.0.0", "missing.py"))
+        self.assertIsNone(self.reader.read_file("v2.0.0", "setup.py"))
+        self.assertTrue(self.reader.exists("master", "setup.py"))
+        self.assertFalse(self.reader.exists("master", "missing.py"))
+
+    def test_resolve(self):
+        head = git(self.repo_dir, "rev-parse", "HEAD").strip()
+        self.assertEqual(self.reader.resolve("v1.0.0"), head)
+        self.assertEqual(self.reader.resolve("refs/heads/master"), head)
+        self.assertIsNone(self.reader.resolve("nonexistent"))
+        self.assertRaises(ValueError, self.reader.resolve, "HEAD\nHEAD")
+
+    def test_restarted(self):
+        self.reader.read_file("HEAD", "setup.py")
+        self.reader.close()
+        # the processes start again on the next read
+        self.assertEqual(self.reader.read_file("HEAD", "setup.py"), "requires = []\n")
+
+
+class TestReadAtRef(FleetTestCase):
+    def setUp(self):
+        super(TestReadAtRef, self).setUp()
+        # the working tree moves on from the v1.0.0 tag
+        self.write("beta", "beta/__init__.py", '__version__ = "1.1.0"\n')
+        self.write("beta", "setup.py", "requires = ['alpha==1.1.0']\n")
+
+    def test_ref(self):
+        self.use_registry("v1.0.0")
+        beta = GITHUB_REPOS["beta"]
+        self.assertEqual(str(beta.current_version), "1.0.0")
+        self.assertEqual(beta.get_module_requires(), {"alpha": "1.0.0"})
+        self.assertEqual(beta._changelog.unreleased, ["### Fixed", " * fixed a thing in beta\n"])
+
+    def test_plan_at_ref(self):
+        self.use_registry("v1.0.0")
+        plan = self.make_plan()
+        setup_py = os.path.join(self.repo_dirs["beta"], "setup.py")
+        self.assertIn("'alpha==1.0.1rc1'", plan.overlay.read(setup_py))
+        self.assertEqual(plan.repos["beta"]["head"],
+                         git(self.repo_dirs["beta"], "rev-parse", "v1.0.0^{commit}").strip())
+        # the working tree edits aren't read
+        self.assertNotIn("1.1.0", plan.overlay.read(setup_py))
+
+
+if __name__ == "__main__":
+    unittest.main()
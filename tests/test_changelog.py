@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from release_tool.changelog import Changelog
+
+HEAD = """# Changelog
+
+## [Unreleased]
+### Fixed
+  * fixed a thing
+  *
+
+### Added
+  *
+
+"""
+
+RELEASED = """## [0.2.0] - 2017-02-01
+### Added
+ * feature two
+
+## [0.2.0rc1] - 2017-01-15
+### Fixed
+ * fixed one
+
+## [0.1.0] - 2017-01-01
+### Added
+ * feature one
+"""
+
+
+class TestChangelog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "CHANGELOG.md")
+        with open(self.path, "w") as f:
+            f.write(HEAD + RELEASED)
+        self.changelog = Changelog("module", self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_head(self):
+        self.assertEqual(self.changelog.tail_offset, len(HEAD))
+        self.assertEqual(self.changelog.unreleased, ["### Fixed", " * fixed a thing\n"])
+        self.assertEqual("".join(self.changelog.start), "# Changelog\n\n## [Unreleased]\n")
+
+    def test_index(self):
+        data = HEAD + RELEASED
+        index = self.changelog.index
+        self.assertEqual([entry[:2] for entry in index], [("0.2.0", "2017-02-01"),
+                                                          ("0.2.0rc1", "2017-01-15"),
+                                                          ("0.1.0", "2017-01-01")])
+        version, date, start, end = index[0]
+        self.assertEqual(data[start:end], "### Added\n * feature two\n\n")
+        self.assertEqual(data[index[2][2]:index[2][3]], "### Added\n * feature one\n")
+        self.assertEqual(index[0][3], data.index("## [0.2.0rc1]"))
+
+    def test_sections(self):
+        self.assertEqual([entry[0] for entry in self.changelog.get_sections()], ["0.2.0"])
+        self.assertEqual([entry[0] for entry in self.changelog.get_sections("0.1.0..0.2.0")],
+                         ["0.2.0", "0.2.0rc1"])
+        self.assertEqual(self.changelog.get_notes("0.1.0"),
+                         ["## [0.1.0] - 2017-01-01\n### Added\n * feature one"])
+
+    def test_specifier_sections(self):
+        self.assertEqual([entry[0] for entry in self.changelog.get_sections("<0.2.0")],
+                         ["0.2.0rc1", "0.1.0"])
+        self.assertEqual([entry[0] for entry in self.changelog.get_sections(">=0.2.0rc1")],
+                         ["0.2.0", "0.2.0rc1"])
+
+    def test_bumped_head_keeps_the_tail(self):
+        bumped = self.changelog.render_head("0.3.0") + \
+            (HEAD + RELEASED)[self.changelog.tail_offset:]
+        self.assertTrue(bumped.endswith(RELEASED))
+        self.assertIn("## [0.3.0] - ", bumped)
+        self.assertIn("### Fixed\n * fixed a thing\n", bumped)
+
+    def test_read_from_elsewhere(self):
+        changelog = Changelog("module", "/nonexistent/CHANGELOG.md",
+                              read=lambda path: HEAD + RELEASED)
+        self.assertEqual(changelog.tail_offset, self.changelog.tail_offset)
+        self.assertEqual(changelog.index, self.changelog.index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import sys
+import StringIO
+import unittest
+
+from release_tool import release_tool
+
+
+class TestHelp(unittest.TestCase):
+    def test_help(self):
+        stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+        try:
+            self.assertRaises(SystemExit, release_tool.bump_main, ["--help"])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(sorted(name for name, _ in release_tool.COMMAND_HELP),
+                         sorted(release_tool.COMMANDS))
+        for command in release_tool.COMMANDS:
+            self.assertIn("\n  %s " % command, output)
+        for option in ("--config", "--profile", "--trace-file", "--journal", "--dry-run"):
+            self.assertIn(option, output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from release_tool.commit import commit_files
+from tests.helpers import git, make_repo
+
+
+class TestCommitFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repo_dir = make_repo(os.path.join(self.directory, "module"), {
+            "setup.py": "requires = []\n",
+            "CHANGELOG.md": "# Changelog\n",
+            "bin/run": "#!/bin/sh\n",
+            "README.md": "readme\n",
+        })
+        os.chmod(os.path.join(self.repo_dir, "bin/run"), 0o755)
+        git(self.repo_dir, "commit", "-q", "-a", "-m", "executable")
+        self.parent = git(self.repo_dir, "rev-parse", "HEAD").strip()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, contents):
+        with open(os.path.join(self.repo_dir, path), "w") as f:
+            f.write(contents)
+
+    def test_only_the_given_paths(self):
+        self.write("setup.py", "requires = ['six']\n")
+        self.write("bin/run", "#!/bin/sh\nexit 0\n")
+        self.write("CHANGELOG.md", "# Changelog\n\n## [1.0.1]\n")
+        # a staged and an unstaged change the release doesn't touch
+        self.write("README.md", "staged\n")
+        git(self.repo_dir, "add", "README.md")
+        self.write("README.md", "unstaged\n")
+
+        paths = [os.path.join(self.repo_dir, path) for path in ["setup.py", "bin/run"]]
+        commit = commit_files(self.repo_dir, "master", paths, "Bump version 1.0.0 --> 1.0.1",
+                              sign=False)
+        self.assertEqual(git(self.repo_dir, "rev-parse", "HEAD").strip(), commit)
+        self.assertEqual(git(self.repo_dir, "rev-parse", "HEAD^").strip(), self.parent)
+        self.assertEqual(git(self.repo_dir, "diff", "--name-only", "HEAD^", "HEAD").split(),
+                         ["bin/run", "setup.py"])
+        self.assertEqual(git(self.repo_dir, "show", "HEAD:setup.py"), "requires = ['six']\n")
+        self.assertIn("100755 blob", git(self.repo_dir, "ls-tree", "HEAD", "bin/run"))
+        message = git(self.repo_dir, "log", "-1", "--format=%B")
+        self.assertTrue(message.startswith("Bump version 1.0.0 --> 1.0.1\n\n"))
+        self.assertIn("Signed-off-by: test <test@example.com>", message)
+        # the committed paths are clean, everything else is as it was
+        self.assertEqual(git(self.repo_dir, "status", "--porcelain").splitlines(),
+                         [" M CHANGELOG.md", "MM README.md"])
+        self.assertEqual(git(self.repo_dir, "show", ":README.md"), "staged\n")
+
+    def test_branch_moved(self):
+        self.write("setup.py", "requires = ['six']\n")
+        path = os.path.join(self.repo_dir, "setup.py")
+        git(self.repo_dir, "branch", "other")
+        commit = commit_files(self.repo_dir, "other", [path], "Bump version", sign=False)
+        self.assertEqual(git(self.repo_dir, "rev-parse", "other").strip(), commit)
+        self.assertEqual(git(self.repo_dir, "rev-parse", "master").strip(), self.parent)
+
+
+if __name__ == "__main__":
+    unittest.main()
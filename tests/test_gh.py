@@ -0,0 +1,138 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import BaseHTTPServer
+
+from release_tool import gh
+from release_tool.cache import ResponseCache
+
+
+class ServerErrorHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.command)
+        self.send_response(502)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class ConditionalHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = '{"full_name": "a/b", "git_url": "git://github.com/a/b.git"}'
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(os.path.join(self.directory, "github"))
+        ConditionalHandler.requests = []
+        self.server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), ConditionalHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = "http://127.0.0.1:%i" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_revalidated(self):
+        for _ in range(2):
+            repo = gh.GitHubClient(None, self.url, cache=self.cache).get_repo("a/b")
+            self.assertEqual(repo.git_url, "git://github.com/a/b.git")
+        self.assertEqual(ConditionalHandler.requests, [None, '"v1"'])
+
+    def test_offline(self):
+        gh.GitHubClient(None, self.url, cache=self.cache).get_repo("a/b")
+        self.cache.offline = True
+        client = gh.GitHubClient(None, self.url, cache=self.cache)
+        self.assertEqual(client.get_repo("a/b").full_name, "a/b")
+        self.assertRaises(Exception, client.get_repo, "a/c")
+        self.assertEqual(len(ConditionalHandler.requests), 1)
+
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self._sleep, gh.time.sleep = gh.time.sleep, self.sleeps.append
+
+    def tearDown(self):
+        gh.time.sleep = self._sleep
+
+    def serve(self, method, path, **kwargs):
+        """Make a request to a server answering everything with a 502, returns its requests"""
+        ServerErrorHandler.requests = []
+        server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), ServerErrorHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            client = gh.GitHubClient(None, "http://127.0.0.1:%i" % server.server_port)
+            self.assertRaises(Exception, client.request, method, path, **kwargs)
+        finally:
+            server.shutdown()
+            server.server_close()
+        return ServerErrorHandler.requests
+
+    def test_server_errors(self):
+        self.assertEqual(len(self.serve("GET", "/repos/a/b")), gh.MAX_ATTEMPTS)
+        # no backoff after the last attempt
+        self.assertEqual(self.sleeps, [2 ** i for i in range(gh.MAX_ATTEMPTS - 1)])
+
+    def test_post_not_repeated(self):
+        # the release may have been created before the error
+        self.assertEqual(self.serve("POST", "/repos/a/b/releases", json={}), ["POST"])
+        self.assertEqual(self.sleeps, [])
+
+    def test_connection_errors(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        client = gh.GitHubClient(None, "http://127.0.0.1:%i" % port)
+        self.assertRaises(client._transient_errors, client.request, "GET", "/repos/a/b")
+        self.assertEqual(len(self.sleeps), gh.MAX_ATTEMPTS - 1)
+
+    def test_timeout(self):
+        # accepts connections but never answers
+        stalled = socket.socket()
+        stalled.bind(("127.0.0.1", 0))
+        stalled.listen(gh.MAX_ATTEMPTS)
+        timeout, gh.REQUEST_TIMEOUT = gh.REQUEST_TIMEOUT, 0.1
+        try:
+            client = gh.GitHubClient(None, "http://127.0.0.1:%i" % stalled.getsockname()[1])
+            self.assertRaises(client._transient_errors, client.request, "GET", "/repos/a/b")
+        finally:
+            gh.REQUEST_TIMEOUT = timeout
+            stalled.close()
+        self.assertEqual(len(self.sleeps), gh.MAX_ATTEMPTS - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from release_tool.graph import DependencyGraph
+
+
+def settings(dependencies):
+    return {"repo-%s" % module_name: {"module": module_name, "depends on": upstreams}
+            for module_name, upstreams in dependencies.iteritems()}
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        # a diamond: b and c depend on a, d on both of them, e is unrelated
+        self.graph = DependencyGraph(settings({
+            "a": [], "b": ["a"], "c": ["a", "unconfigured"], "d": ["b", "c"], "e": [],
+        }))
+
+    def test_levels(self):
+        self.assertEqual(self.graph.levels, [["a", "e"], ["b", "c"], ["d"]])
+        self.assertEqual(self.graph.level_of["d"], 2)
+        self.assertEqual(self.graph.upstreams["c"], ["a"])
+
+    def test_bump_order(self):
+        self.assertEqual(self.graph.closure("b"), {"b", "d"})
+        self.assertEqual(self.graph.bump_levels("a"), [["a"], ["b", "c"], ["d"]])
+        self.assertEqual(self.graph.bump_order("c"), ["c", "d"])
+        self.assertRaises(Exception, self.graph.closure, "unconfigured")
+
+    def test_round_trip(self):
+        graph = DependencyGraph.from_dict(self.graph.to_dict())
+        self.assertEqual(graph.levels, self.graph.levels)
+        self.assertEqual(graph.bump_order("a"), self.graph.bump_order("a"))
+
+    def test_cycle(self):
+        with self.assertRaises(Exception) as raised:
+            DependencyGraph(settings({"a": ["c"], "b": ["a"], "c": ["b"], "d": []}))
+        self.assertIn("a, b, c", str(raised.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
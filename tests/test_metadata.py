@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from release_tool.metadata import parse_assignments, read_metadata, read_source_metadata
+
+SETUP = """import os
+from setuptools import setup
+
+base = ['six']
+requires = base + [
+    'lbryschema==0.0.10',
+]
+requires += ['requests>=2.0']
+extras = ('a',) + ('b',)
+dynamic = os.environ.get('X', '')
+name = 'lbryum'
+name = name.upper()
+
+setup(name='lbryum', install_requires=requires)
+"""
+
+
+class TestParseAssignments(unittest.TestCase):
+    def test_literals(self):
+        names = parse_assignments(SETUP)
+        self.assertEqual(names["requires"], ["six", "lbryschema==0.0.10", "requests>=2.0"])
+        self.assertEqual(names["extras"], ("a", "b"))
+
+    def test_not_static(self):
+        names = parse_assignments(SETUP)
+        self.assertNotIn("dynamic", names)
+        # a later assignment that can't be evaluated drops the earlier value
+        self.assertNotIn("name", names)
+        self.assertEqual(parse_assignments("x = [1] + (2,)\n"), {})
+
+    def test_version(self):
+        self.assertEqual(parse_assignments('__version__ = "1.2.3"\n'), {"__version__": "1.2.3"})
+
+
+class TestReadMetadata(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "setup.py")
+        with open(self.path, "w") as f:
+            f.write("def get_requires():\n    return ['six']\n\n\nrequires = get_requires()\n"
+                    "\nsetup(name='x')\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_exec_fallback(self):
+        self.assertNotIn("requires", read_metadata(self.path, ["requires"]))
+        names = read_metadata(self.path, ["requires"], self.directory, execute=True)
+        self.assertEqual(names["requires"], ["six"])
+
+    def test_source(self):
+        source = "requires = ['a'] + ['b']\nsetup()\n"
+        self.assertEqual(read_source_metadata(source, self.path)["requires"], ["a", "b"])
+        names = read_source_metadata("requires = list('ab')\nsetup()\n", self.path,
+                                     ["requires"], self.directory, execute=True)
+        self.assertEqual(names["requires"], ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from release_tool import overlay
+from release_tool.overlay import FileOverlay, atomic_write
+
+
+class TestFileOverlay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "setup.py")
+        with open(self.path, "w") as f:
+            f.write("a\nb\nc\n")
+        os.chmod(self.path, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path, "r") as f:
+            return f.read()
+
+    def test_edits_are_coalesced(self):
+        files = FileOverlay()
+        files.write_lines(self.path, ["A"] + files.read_lines(self.path)[1:])
+        with open(self.path, "w") as f:
+            f.write("changed\n")
+        # read from memory, not from the file
+        files.write_lines(self.path, files.read_lines(self.path)[:2] + ["C"])
+        self.assertEqual(files.read(self.path), "A\nb\nC\n")
+        self.assertEqual(files.paths, [self.path])
+        self.assertEqual(self.read(), "changed\n")
+        files.flush()
+        self.assertEqual(self.read(), "A\nb\nC\n")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o755)
+
+    def test_head(self):
+        files = FileOverlay()
+        files.write_head(self.path, "A\n", 2)
+        self.assertEqual(files.read(self.path), "A\nb\nc\n")
+        self.assertEqual(files.entry(self.path), ("A\n", 2))
+        # only the head is compared
+        self.assertIn("-a\n+A\n", files.diff(self.path))
+        self.assertNotIn("b", files.diff(self.path).split("@@")[-1])
+        files.flush()
+        self.assertEqual(self.read(), "A\nb\nc\n")
+
+    def test_read_original(self):
+        files = FileOverlay(read_original=lambda path: "x\ny\n")
+        files.write_lines(self.path, files.read_lines(self.path) + ["z"])
+        self.assertEqual(files.read(self.path), "x\ny\nz\n")
+        self.assertIn("+z\n", files.diffs()[0])
+
+    def test_new_file(self):
+        path = os.path.join(self.directory, "new.txt")
+        files = FileOverlay()
+        files.write(path, "new\n")
+        self.assertIn("+new\n", files.diff(path))
+        files.flush([path])
+        with open(path, "r") as f:
+            self.assertEqual(f.read(), "new\n")
+
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "CHANGELOG.md")
+        with open(self.path, "w") as f:
+            f.write("old\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_interrupted(self):
+        rename = os.rename
+
+        def fail(src, dst):
+            raise OSError("interrupted")
+
+        overlay.os.rename = fail
+        try:
+            self.assertRaises(OSError, atomic_write, self.path, "new\n")
+        finally:
+            overlay.os.rename = rename
+        # the original is untouched and the temp file is gone
+        with open(self.path, "r") as f:
+            self.assertEqual(f.read(), "old\n")
+        self.assertEqual(os.listdir(self.directory), ["CHANGELOG.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
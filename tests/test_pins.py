@@ -0,0 +1,92 @@
+import os
+import unittest
+
+from release_tool.bump_module import GITHUB_REPOS, pin_matches, repin
+from release_tool.overlay import FileOverlay
+from release_tool.pins import PinMatrix, accepts, parse_pin
+from release_tool.version import Version
+from tests.helpers import FleetTestCase, git
+
+
+class TestRepin(unittest.TestCase):
+    def test_repin(self):
+        self.assertEqual(repin("==1.0.0", "1.0.1"), "==1.0.1")
+        self.assertEqual(repin("~=1.0.0", "1.0.1"), "~=1.0.1")
+        self.assertEqual(repin(">=1.0,<1.1", "1.1.0"), "==1.1.0")
+        self.assertEqual(repin("!=1.0.0", "1.1.0"), "==1.1.0")
+
+    def test_pin_matches(self):
+        self.assertTrue(pin_matches("1.0.0", "1.0.0"))
+        self.assertTrue(pin_matches(">=1.0,<1.1", Version.parse("1.0.5")))
+        self.assertFalse(pin_matches("1.0.0", "1.0.1"))
+        self.assertFalse(pin_matches(None, "1.0.0"))
+        self.assertFalse(pin_matches("not a version", "1.0.0"))
+
+    def test_parsed_pin(self):
+        version = Version.parse("1.0.5")
+        self.assertTrue(accepts(parse_pin("1.0.5"), version))
+        self.assertFalse(accepts(parse_pin("1.0.0"), version))
+        self.assertTrue(accepts(parse_pin(">=1.0,<1.1"), version))
+        self.assertFalse(accepts(parse_pin("~=1.1.0"), version))
+        self.assertIsNone(parse_pin("not a version"))
+        self.assertFalse(accepts(None, version))
+
+
+class TestUpdateSetup(FleetTestCase):
+    def update(self, new_version="1.0.1"):
+        overlay = FileOverlay()
+        GITHUB_REPOS["beta"].update_setup(overlay, "alpha", new_version)
+        return overlay.read(os.path.join(self.repo_dirs["beta"], "setup.py"))
+
+    def test_pin(self):
+        self.assertIn("    'alpha==1.0.1',\n", self.update())
+        # only read into the overlay
+        self.assertIn("'alpha==1.0.0'", self.read("beta", "setup.py"))
+
+    def test_specifier(self):
+        self.write("beta", "setup.py", 'requires = ["six", "alpha >=1.0, <1.1"]  # pinned\n')
+        self.assertEqual(self.update("1.1.0"), 'requires = ["six", "alpha ==1.1.0"]  # pinned\n')
+        self.write("beta", "setup.py", "requires = ['alpha~=1.0.0']\n")
+        self.assertEqual(self.update(), "requires = ['alpha~=1.0.1']\n")
+
+    def test_missing(self):
+        self.write("beta", "setup.py", "requires = ['alphabet==1.0.0']\n")
+        self.assertRaises(Exception, self.update)
+
+
+class TestPinMatrix(FleetTestCase):
+    def setUp(self):
+        super(TestPinMatrix, self).setUp()
+        self.write("alpha", "alpha/__init__.py", '__version__ = "1.0.1"\n')
+        git(self.repo_dirs["alpha"], "commit", "-q", "-a", "-m", "Bump version")
+
+    def matrix(self):
+        return PinMatrix([GITHUB_REPOS[repo_name] for repo_name in GITHUB_REPOS], jobs=2)
+
+    def test_drift(self):
+        matrix = self.matrix()
+        self.assertEqual([stale[:4] for stale in matrix.drift()], [
+            ("beta", "alpha", "setup.py", "1.0.0"),
+            ("beta", "alpha", "requirements.txt", "1.0.0"),
+        ])
+        self.assertIn("1.0.0 (1.0.1)", matrix.format_table())
+
+    def test_sync(self):
+        overlay = self.matrix().sync()
+        self.assertEqual(len(overlay.paths), 2)
+        overlay.flush()
+        self.assertIn("'alpha==1.0.1'", self.read("beta", "setup.py"))
+        self.assertIn("alpha.git@v1.0.1#egg=alpha", self.read("beta", "requirements.txt"))
+        self.use_registry()
+        self.assertEqual(self.matrix().drift(), [])
+
+    def test_specifier_in_range(self):
+        self.write("beta", "setup.py", "requires = ['alpha>=1.0,<1.1']\n")
+        self.write("beta", "requirements.txt", "")
+        matrix = self.matrix()
+        self.assertEqual(matrix.drift(), [])
+        self.assertNotIn("(1.0.1)", matrix.format_table())
+
+
+if __name__ == "__main__":
+    unittest.main()
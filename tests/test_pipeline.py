@@ -0,0 +1,31 @@
+import unittest
+
+from release_tool.pipeline import run_levels
+
+
+class TestRunLevels(unittest.TestCase):
+    def test_runs_every_level(self):
+        done = []
+        results = run_levels([["a", "b"], [], ["c"]], lambda name: done.append(name) or name)
+        self.assertEqual(sorted(done), ["a", "b", "c"])
+        self.assertEqual([result.result for result in results], ["a", "b", "c"])
+
+    def test_stops_after_a_failed_level(self):
+        done, levels_done = [], []
+
+        def ship(name):
+            if name == "b":
+                raise Exception("push rejected")
+            done.append(name)
+
+        results = run_levels([["a", "b"], ["c"]], ship, jobs=2,
+                             on_level_done=lambda results: levels_done.append(results))
+        self.assertEqual(done, ["a"])
+        self.assertEqual(len(levels_done), 1)
+        failed = [result for result in results if result.failed]
+        self.assertEqual([result.name for result in failed], ["b"])
+        self.assertIn("push rejected", failed[0].trace)
+
+
+if __name__ == "__main__":
+    unittest.main()
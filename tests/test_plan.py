@@ -0,0 +1,83 @@
+import os
+import unittest
+
+from release_tool.plan import ReleasePlan
+from tests.helpers import FleetTestCase, git
+
+
+class TestReleasePlan(FleetTestCase):
+    def assertRefused(self, plan, problem, **kwargs):
+        with self.assertRaises(Exception) as raised:
+            plan.check_preconditions(**kwargs)
+        self.assertIn(problem, str(raised.exception))
+
+    def test_capture(self):
+        plan = self.make_plan()
+        self.assertEqual(plan.levels, [["alpha"], ["beta"]])
+        self.assertFalse(plan.is_release)
+        beta = plan.repos["beta"]
+        self.assertEqual((beta["tag"], beta["branch"]), ("v1.0.1rc1", "master"))
+        self.assertEqual(beta["head"], git(self.repo_dirs["beta"], "rev-parse", "HEAD").strip())
+        self.assertEqual([os.path.relpath(path, self.repo_dirs["beta"])
+                          for path in plan.files("beta")],
+                         ["beta/__init__.py", "requirements.txt", "setup.py"])
+        setup_py = os.path.join(self.repo_dirs["beta"], "setup.py")
+        self.assertIn("'alpha==1.0.1rc1'", plan.overlay.read(setup_py))
+        # nothing is written until the plan is shipped
+        self.assertIn("'alpha==1.0.0'", self.read("beta", "setup.py"))
+
+    def test_save_and_load(self):
+        plan = self.make_plan()
+        path = os.path.join(self.directory, "plan.json")
+        plan.save(path)
+        loaded = ReleasePlan.load(path)
+        self.assertEqual(loaded.repos, plan.repos)
+        for path in plan.files("beta"):
+            self.assertEqual(loaded.overlay.read(path), plan.overlay.read(path))
+
+    def test_preconditions(self):
+        self.make_plan().check_preconditions()
+
+    def test_branch_moved(self):
+        plan = self.make_plan()
+        git(self.repo_dirs["alpha"], "commit", "-q", "--allow-empty", "-m", "meanwhile")
+        self.assertRefused(plan, "alpha: master moved")
+        # only the given repos are checked
+        plan.check_preconditions(["beta"])
+
+    def test_file_changed(self):
+        plan = self.make_plan()
+        self.write("beta", "setup.py", self.read("beta", "setup.py") + "# local edit\n")
+        self.assertRefused(plan, "beta: %s changed" % os.path.join(self.repo_dirs["beta"],
+                                                                   "setup.py"))
+
+    def test_written(self):
+        plan = self.make_plan()
+        plan.overlay.flush(plan.files("beta"))
+        self.assertRefused(plan, "setup.py changed")
+        # an interrupted ship wrote them
+        plan.check_preconditions(allow_written=True)
+
+    def test_tag_exists(self):
+        plan = self.make_plan()
+        git(self.repo_dirs["beta"], "tag", "v1.0.1rc1")
+        self.assertRefused(plan, "beta: tag v1.0.1rc1 already exists")
+
+    def test_other_branch_checked_out(self):
+        plan = self.make_plan()
+        git(self.repo_dirs["alpha"], "checkout", "-q", "-b", "feature")
+        self.assertRefused(plan, "alpha: master isn't checked out")
+
+    def test_merge(self):
+        alpha = self.make_plan("alpha", bump_deps=False)
+        self.use_registry()
+        beta = self.make_plan("beta", bump_deps=False)
+        merged = ReleasePlan.merge([alpha, beta])
+        self.assertEqual(list(merged.repos), ["alpha", "beta"])
+        self.assertEqual(merged.levels, [["alpha"], ["beta"]])
+        merged.check_preconditions()
+        self.assertRaises(Exception, ReleasePlan.merge, [alpha, merged])
+
+
+if __name__ == "__main__":
+    unittest.main()
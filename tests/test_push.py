@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from release_tool import bump_module, conf
+from tests.helpers import git, make_repo
+
+
+class TestPushRelease(unittest.TestCase):
+    """Pushing a release's branch and tag to a local bare repo standing in for GitHub"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.remote = os.path.join(self.directory, "remote.git")
+        self.repo_dir = make_repo(os.path.join(self.directory, "module"),
+                                  {"module/__init__.py": '__version__ = "1.0.0"\n'},
+                                  self.remote)
+        config_path = os.path.join(self.directory, "release-tool.yml")
+        with open(config_path, "w") as f:
+            f.write("module:\n  path: %s\n  remote: test\n" % self.repo_dir)
+        self.config = conf.Config(config_path)
+        self.config.use_cache = False
+        self._config, bump_module.CONFIG = bump_module.CONFIG, self.config
+        self.repo = bump_module.BumpGitModule("module")
+        git(self.repo_dir, "commit", "-q", "--allow-empty", "-m", "Bump version")
+        git(self.repo_dir, "tag", "v1.0.1")
+
+    def tearDown(self):
+        bump_module.CONFIG = self._config
+        shutil.rmtree(self.directory)
+
+    def remote_ref(self, ref):
+        return git(self.remote, "for-each-ref", "--format=%(objectname)", ref).strip() or None
+
+    def local_ref(self, ref):
+        return git(self.repo_dir, "rev-parse", ref).strip()
+
+    def reject_tag(self):
+        """Make the remote already have v1.0.1, on another commit"""
+        git(self.remote, "tag", "v1.0.1", self.remote_ref("refs/heads/master"))
+
+    def test_atomic(self):
+        self.repo.push_release("master", "v1.0.1", atomic=True)
+        self.assertEqual(self.remote_ref("refs/heads/master"), self.local_ref("master"))
+        self.assertEqual(self.remote_ref("refs/tags/v1.0.1"), self.local_ref("v1.0.1"))
+
+    def test_atomic_rejected(self):
+        self.reject_tag()
+        old_head = self.remote_ref("refs/heads/master")
+        self.assertRaises(Exception, self.repo.push_release, "master", "v1.0.1", atomic=True)
+        # neither ref moved
+        self.assertEqual(self.remote_ref("refs/heads/master"), old_head)
+
+    def test_separate(self):
+        self.repo.push_release("master", "v1.0.1", atomic=False)
+        self.assertEqual(self.remote_ref("refs/heads/master"), self.local_ref("master"))
+        self.assertEqual(self.remote_ref("refs/tags/v1.0.1"), self.local_ref("v1.0.1"))
+
+    def test_separate_rejected(self):
+        self.reject_tag()
+        self.assertRaises(Exception, self.repo.push_release, "master", "v1.0.1", atomic=False)
+        # the branch went out before the tag was rejected
+        self.assertEqual(self.remote_ref("refs/heads/master"), self.local_ref("master"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+import os
+import sys
+import functools
+import StringIO
+import unittest
+
+from release_tool import journal as journal_module
+from release_tool import release_tool
+from release_tool.bump_module import GITHUB_REPOS
+from release_tool.journal import Journal
+from tests.helpers import FleetTestCase, git
+
+
+class FakeGitHubRepo(object):
+    def __init__(self, releases):
+        self.releases = releases
+
+    def create_git_release(self, tag, name, message, draft=False, prerelease=False):
+        self.releases.append((tag, draft, prerelease))
+
+
+class ShipTestCase(FleetTestCase):
+    """Shipping the fleet's repos to their bare remotes, with the draft releases recorded"""
+
+    def setUp(self):
+        super(ShipTestCase, self).setUp()
+        self._journal_path = journal_module.JOURNAL_PATH
+        journal_module.JOURNAL_PATH = os.path.join(self.directory, "journal.json")
+        self.releases = []
+        self.fake_github()
+
+    def tearDown(self):
+        journal_module.JOURNAL_PATH = self._journal_path
+        super(ShipTestCase, self).tearDown()
+
+    def fake_github(self):
+        for repo_name in ("alpha", "beta"):
+            GITHUB_REPOS[repo_name].git_repo_v3 = FakeGitHubRepo(self.releases)
+
+    def run_quietly(self, fn, *args):
+        """Run fn, returns whether it finished the ship rather than exiting with a failure"""
+        self.output = StringIO.StringIO()
+        stdout, sys.stdout = sys.stdout, self.output
+        print_failures = release_tool.print_failures
+        release_tool.print_failures = functools.partial(print_failures, out=self.output)
+        try:
+            fn(*args)
+        except SystemExit:
+            return False
+        finally:
+            sys.stdout = stdout
+            release_tool.print_failures = print_failures
+        return True
+
+    def ship(self, plan):
+        return self.run_quietly(release_tool.execute_plan, Journal.start(plan))
+
+    def remote_ref(self, module_name, ref):
+        remote = os.path.join(self.directory, "%s.git" % module_name)
+        return git(remote, "for-each-ref", "--format=%(objectname)", ref).strip() or None
+
+    def local_ref(self, module_name, ref):
+        return git(self.repo_dirs[module_name], "for-each-ref", "--format=%(objectname)",
+                   ref).strip() or None
+
+    def reject_tag(self, module_name, tag):
+        """Make the remote already have tag, so pushing the release is rejected"""
+        remote = os.path.join(self.directory, "%s.git" % module_name)
+        git(remote, "tag", tag, "refs/heads/master")
+
+    def assertShipped(self, module_name, tag):
+        self.assertEqual(self.remote_ref(module_name, "refs/heads/master"),
+                         self.local_ref(module_name, "refs/heads/master"))
+        self.assertEqual(self.remote_ref(module_name, "refs/tags/%s" % tag),
+                         self.local_ref(module_name, "refs/tags/%s" % tag))
+        self.assertEqual(git(self.repo_dirs[module_name], "status", "--porcelain"), "")
+
+
+class TestShip(ShipTestCase):
+    def test_ship(self):
+        self.assertTrue(self.ship(self.make_plan()))
+        self.assertShipped("alpha", "v1.0.1rc1")
+        self.assertShipped("beta", "v1.0.1rc1")
+        self.assertEqual(sorted(self.releases), [("v1.0.1rc1", True, True)] * 2)
+        self.assertIn("'alpha==1.0.1rc1'", git(self.repo_dirs["beta"], "show", "HEAD:setup.py"))
+        self.assertFalse(os.path.exists(journal_module.JOURNAL_PATH))
+
+    def test_changed_file(self):
+        plan = self.make_plan()
+        edited = self.read("beta", "setup.py") + "# local edit\n"
+        self.write("beta", "setup.py", edited)
+        self.assertFalse(self.ship(plan))
+        self.assertIn("setup.py changed since the plan was computed", self.output.getvalue())
+        self.assertShipped("alpha", "v1.0.1rc1")
+        # beta wasn't written or committed, the edit is left alone
+        self.assertEqual(self.local_ref("beta", "refs/heads/master"), plan.repos["beta"]["head"])
+        self.assertEqual(self.read("beta", "setup.py"), edited)
+        self.assertIn('"1.0.0"', self.read("beta", "beta/__init__.py"))
+
+
+class TestResume(ShipTestCase):
+    def test_failed_push(self):
+        self.reject_tag("beta", "v1.0.1rc1")
+        self.assertFalse(self.ship(self.make_plan()))
+        self.assertShipped("alpha", "v1.0.1rc1")
+        self.assertEqual(Journal.load().completed("beta"), ["write", "commit", "tag"])
+        self.assertNotEqual(self.remote_ref("beta", "refs/tags/v1.0.1rc1"),
+                            self.local_ref("beta", "refs/tags/v1.0.1rc1"))
+
+        git(os.path.join(self.directory, "beta.git"), "tag", "-d", "v1.0.1rc1")
+        self.assertTrue(self.run_quietly(release_tool.resume_main, []))
+        self.assertShipped("beta", "v1.0.1rc1")
+        self.assertEqual(len(self.releases), 2)
+        self.assertFalse(os.path.exists(journal_module.JOURNAL_PATH))
+
+    def test_interrupted_write(self):
+        plan = self.make_plan()
+        Journal.start(plan)
+        # the run died after writing alpha's files, before recording it
+        plan.overlay.flush(plan.files("alpha"))
+        self.assertTrue(self.run_quietly(release_tool.resume_main, []))
+        self.assertShipped("alpha", "v1.0.1rc1")
+        self.assertShipped("beta", "v1.0.1rc1")
+        self.assertEqual(git(self.repo_dirs["alpha"], "show", "HEAD:alpha/__init__.py"),
+                         '__version__ = "1.0.1rc1"\n')
+
+    def test_nothing_to_resume(self):
+        self.assertRaises(Exception, release_tool.resume_main, [])
+
+
+class TestRollback(ShipTestCase):
+    def test_rollback(self):
+        plan = self.make_plan()
+        setup_py = self.read("beta", "setup.py")
+        self.reject_tag("beta", "v1.0.1rc1")
+        self.assertFalse(self.ship(plan))
+        self.assertTrue(self.run_quietly(release_tool.rollback_main, []))
+        # beta is back where the plan started, alpha was pushed and is left
+        self.assertEqual(self.local_ref("beta", "refs/heads/master"), plan.repos["beta"]["head"])
+        self.assertIsNone(self.local_ref("beta", "refs/tags/v1.0.1rc1"))
+        self.assertEqual(self.read("beta", "setup.py"), setup_py)
+        self.assertEqual(git(self.repo_dirs["beta"], "status", "--porcelain"), "")
+        self.assertShipped("alpha", "v1.0.1rc1")
+        # everything left in the journal was shipped
+        self.assertFalse(os.path.exists(journal_module.JOURNAL_PATH))
+
+    def test_rollback_unstarted(self):
+        plan = self.make_plan()
+        self.reject_tag("alpha", "v1.0.1rc1")
+        self.assertFalse(self.ship(plan))
+        self.assertTrue(self.run_quietly(release_tool.rollback_main, []))
+        self.assertEqual(self.local_ref("alpha", "refs/heads/master"), plan.repos["alpha"]["head"])
+        self.assertIsNone(self.local_ref("alpha", "refs/tags/v1.0.1rc1"))
+        self.assertEqual(git(self.repo_dirs["alpha"], "status", "--porcelain"), "")
+        # beta was never started, there's nothing left to resume
+        self.assertEqual(self.local_ref("beta", "refs/heads/master"), plan.repos["beta"]["head"])
+        self.assertFalse(os.path.exists(journal_module.JOURNAL_PATH))
+
+
+class TestShipWithoutWorktree(ShipTestCase):
+    def setUp(self):
+        super(TestShipWithoutWorktree, self).setUp()
+        self.use_registry(at_branch=True)
+        self.fake_github()
+        for module_name in ("alpha", "beta"):
+            git(self.repo_dirs[module_name], "checkout", "-q", "-b", "feature")
+        # work in progress the release must not pick up or disturb
+        self.write("beta", "setup.py", "requires = ['alpha==2.0.0']\n")
+
+    def test_ship(self):
+        plan = self.make_plan()
+        self.assertEqual(plan.repos["beta"]["branch"], "master")
+        self.assertTrue(self.ship(plan))
+        for module_name in ("alpha", "beta"):
+            self.assertEqual(self.remote_ref(module_name, "refs/heads/master"),
+                             self.local_ref(module_name, "refs/heads/master"))
+            self.assertEqual(self.remote_ref(module_name, "refs/tags/v1.0.1rc1"),
+                             self.local_ref(module_name, "refs/tags/v1.0.1rc1"))
+        self.assertIn("'alpha==1.0.1rc1'", git(self.repo_dirs["beta"], "show", "master:setup.py"))
+        self.assertEqual(git(self.repo_dirs["beta"], "diff", "--name-only", "master^",
+                             "master").split(),
+                         ["beta/__init__.py", "requirements.txt", "setup.py"])
+        # the checkouts are still on their branch with their changes
+        self.assertEqual(git(self.repo_dirs["beta"], "status", "--porcelain"), " M setup.py\n")
+        self.assertEqual(self.read("beta", "setup.py"), "requires = ['alpha==2.0.0']\n")
+        self.assertEqual(git(self.repo_dirs["alpha"], "status", "--porcelain"), "")
+        self.assertEqual(self.local_ref("alpha", "refs/heads/feature"),
+                         plan.repos["alpha"]["head"])
+
+    def test_rollback(self):
+        plan = self.make_plan()
+        self.reject_tag("beta", "v1.0.1rc1")
+        self.assertFalse(self.ship(plan))
+        self.assertTrue(self.run_quietly(release_tool.rollback_main, []))
+        self.assertEqual(self.local_ref("beta", "refs/heads/master"), plan.repos["beta"]["head"])
+        self.assertEqual(self.read("beta", "setup.py"), "requires = ['alpha==2.0.0']\n")
+
+    def test_checked_out(self):
+        git(self.repo_dirs["alpha"], "checkout", "-q", "master")
+        plan = self.make_plan()
+        with self.assertRaises(Exception) as raised:
+            plan.check_preconditions()
+        self.assertIn("alpha: master is checked out", str(raised.exception))
+        # checked out in a linked worktree counts too
+        git(self.repo_dirs["alpha"], "checkout", "-q", "feature")
+        git(self.repo_dirs["alpha"], "worktree", "add", "-q",
+            os.path.join(self.directory, "alpha-master"), "master")
+        self.assertRaises(Exception, plan.check_preconditions)
+        # and so does checking it out after the plan was checked
+        git(self.repo_dirs["alpha"], "worktree", "remove", os.path.join(self.directory,
+                                                                        "alpha-master"))
+        plan.check_preconditions()
+        journal = Journal.start(plan)
+        git(self.repo_dirs["alpha"], "checkout", "-q", "master")
+        self.assertFalse(self.run_quietly(release_tool.execute_plan, journal))
+        self.assertEqual(self.local_ref("alpha", "refs/heads/master"),
+                         plan.repos["alpha"]["head"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import unittest
+
+from tests.helpers import FleetTestCase
+
+
+class TestStack(FleetTestCase):
+    def test_inspecting_doesnt_render(self):
+        stack = self.make_stack()
+        self.assertEqual(stack.repo_sequence, ["alpha", "beta"])
+        self.assertEqual([op.fn.__name__ for op in stack if op.repo == "beta"],
+                         ["update_init", "update_setup", "update_requires"])
+        self.assertEqual(len(stack), 4)
+        self.assertEqual([os.path.relpath(path, self.repo_dirs["beta"])
+                          for path in stack.batch_files("beta")],
+                         ["beta/__init__.py", "requirements.txt", "setup.py"])
+        # none of the above applied an operation
+        self.assertEqual(stack.overlay.paths, [])
+
+    def test_render(self):
+        stack = self.make_stack()
+        overlay = stack.render()
+        self.assertEqual(len(overlay.paths), 4)
+        init = os.path.join(self.repo_dirs["alpha"], "alpha", "__init__.py")
+        self.assertEqual(overlay.read(init), '__version__ = "1.0.1rc1"\n')
+        # the operations are applied once, rendering again changes nothing
+        self.assertIs(stack.render(), overlay)
+        self.assertEqual(len(overlay.paths), 4)
+        self.assertEqual(len(stack), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
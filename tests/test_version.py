@@ -0,0 +1,61 @@
+import unittest
+
+from release_tool.version import Version, Specifier, SpecifierSet, is_specifier
+
+
+class TestVersion(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(Version.parse("v1.2.3"), Version(1, 2, 3))
+        self.assertEqual(Version.parse("1.2"), Version(1, 2, 0))
+        self.assertEqual(Version.parse("1.2.3rc4"), Version(1, 2, 3, 4))
+        self.assertEqual(str(Version.parse("1.2.3rc4")), "1.2.3rc4")
+        self.assertRaises(ValueError, Version.parse, "1.2.x")
+
+    def test_ordering(self):
+        versions = ["0.10.0", "0.9.0", "0.10.0rc2", "0.10.0rc10", "1.0.0", "0.10.1rc1"]
+        self.assertEqual([str(v) for v in sorted(Version.parse(v) for v in versions)],
+                         ["0.9.0", "0.10.0rc2", "0.10.0rc10", "0.10.0", "0.10.1rc1", "1.0.0"])
+        self.assertTrue(Version.parse("1.0.0rc1") < Version.parse("1.0.0"))
+
+    def test_bump(self):
+        self.assertEqual(Version.parse("1.2.3").bump_candidate(), Version(1, 2, 4, 1))
+        self.assertEqual(Version.parse("1.2.4rc1").bump_candidate(), Version(1, 2, 4, 2))
+        self.assertEqual(Version.parse("1.2.4rc2").bump_release(), Version(1, 2, 4))
+        self.assertEqual(Version.parse("1.2.3").bump_release(), Version(1, 2, 4))
+        self.assertEqual(Version.parse("1.2.3").bump_release(minor=True), Version(1, 3, 0))
+        self.assertEqual(Version.parse("1.2.3").bump_candidate(major=True), Version(2, 0, 0, 1))
+
+
+class TestSpecifier(unittest.TestCase):
+    def test_operators(self):
+        version = Version.parse("1.2.3")
+        self.assertTrue(Specifier("==1.2.3").contains(version))
+        self.assertTrue(Specifier("1.2.3").contains(version))
+        self.assertFalse(Specifier("!=1.2.3").contains(version))
+        self.assertTrue(Specifier(">=1.2").contains(version))
+        self.assertTrue(Specifier("<2").contains(version))
+        self.assertFalse(Specifier("<1.2.3").contains(version))
+        self.assertTrue(Specifier(">1.2.3rc1").contains(version))
+
+    def test_compatible_release(self):
+        self.assertTrue(Specifier("~=1.2.3").contains(Version.parse("1.2.9")))
+        self.assertFalse(Specifier("~=1.2.3").contains(Version.parse("1.3.0")))
+        self.assertFalse(Specifier("~=1.2.3").contains(Version.parse("1.2.2")))
+        self.assertTrue(Specifier("~=1.2").contains(Version.parse("1.9.0")))
+        self.assertFalse(Specifier("~=1.2").contains(Version.parse("2.0.0")))
+        self.assertRaises(ValueError, Specifier, "~=1")
+
+    def test_specifier_set(self):
+        specifiers = SpecifierSet(">=1.0.0, <1.1")
+        self.assertTrue(specifiers.contains(Version.parse("1.0.5")))
+        self.assertFalse(specifiers.contains(Version.parse("1.1.0")))
+        self.assertFalse(specifiers.contains(Version.parse("0.9.0")))
+
+    def test_is_specifier(self):
+        self.assertTrue(is_specifier(">=1.0"))
+        self.assertTrue(is_specifier("~=1.0"))
+        self.assertFalse(is_specifier("1.0.0"))
+
+
+if __name__ == "__main__":
+    unittest.main()